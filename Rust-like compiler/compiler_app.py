@@ -6,7 +6,7 @@ from tkinter import ttk, scrolledtext, messagebox
 from graphviz import Digraph
 from pygments import lex
 from pygments.lexers import RustLexer
-from compiler_lexer import Tokenize
+from compiler_lexer import Tokenize, compute_edit
 from compiler_parser import ParseNode, SyntaxParser
 from compiler_semantic_checker import SemanticChecker
 from compiler_codegenerator import Quadruple
@@ -91,6 +91,8 @@ class GrammarVisualizerApp:
         self.lexer = Tokenize()  # 词法分析器
         self.parser = SyntaxParser()  # 语法分析器
         self.checker = SemanticChecker()  # 语义检查器(内置中间代码生成器)
+        self.last_code = None  # 上一次成功词法分析的代码
+        self.last_tokens = None  # 上一次词法分析的结果，用于增量分析
 
         # Notebook组件初始化
         self.tree_notebook = None  # 语法分析树/ACTION表/GOTO表
@@ -508,8 +510,8 @@ class GrammarVisualizerApp:
                 messagebox.showwarning("警告", "请输入要分析的代码")
                 return
 
-            tokens = self.lexer.analyse(code)
-            ast_root, self.analysis_details = self.parser.parse(tokens=tokens, checker=self.checker)
+            tokens = self.lex_code(code)
+            ast_root, self.analysis_details = self.parser.parse(tokens=tokens, checker=self.checker, trace=True)
             self.show_ast(ast_root)
             self.show_step(0)
             errors = self.checker.get_errors()
@@ -521,6 +523,19 @@ class GrammarVisualizerApp:
         except Exception as e:
             messagebox.showerror("错误", f"分析过程中出错: {str(e)}")
 
+    def lex_code(self, code):
+        """词法分析，与上一次的代码相比只重新分析修改过的区域"""
+        try:
+            if self.last_tokens is None:
+                tokens = self.lexer.analyse(code)
+            else:
+                tokens, _ = self.lexer.relex(self.last_tokens, code, *compute_edit(self.last_code, code))
+        except Exception:
+            self.last_code = self.last_tokens = None
+            raise
+        self.last_code, self.last_tokens = code, tokens
+        return tokens
+
     def record_parsing_process(self, tokens):
         """记录语法分析的每一步过程"""
         self.analysis_details = []
@@ -894,8 +909,8 @@ class GrammarVisualizerApp:
         """在单独的线程中启动解析器初始化"""
 
         def parsing_thread():
-            # 执行耗时操作 -- 构建分析表
-            self.parser.build_table(RUST_GRAMMAR_PPT)
+            # 执行耗时操作 -- 构建分析表（文法未修改时读取磁盘缓存）
+            self.parser.load_table(RUST_GRAMMAR_PPT)
 
             # 完成后，在主线程中销毁加载界面并创建主界面
             self.root.after(0, self.finish_loading)
@@ -6,10 +6,17 @@
 输入内容：源代码
 输出内容：词汇元素列表
 """
+import codecs
+import logging
+import mmap
 import os
+import re
 import sys
 sys.path.append(os.getcwd())
+from array import array
+from bisect import bisect_right
 from enum import Enum
+from itertools import repeat
 from compiler_logger import logger
 
 class LexicalType(Enum):
@@ -101,6 +108,9 @@ class LexicalType(Enum):
     # 结束符
     EOF = ('$', False, False, False)
 
+    # 恢复模式下出错范围对应的元素
+    ERROR = ('ERROR', False, False, False)
+
     @property
     def value(self):
         return self._value_[0]
@@ -114,32 +124,492 @@ class LexicalType(Enum):
     def is_delimiter(self):
         return self._value_[3]
 
+def lexical_type_signature():
+    """LexicalType全部成员（含别名）的描述，磁盘缓存以其哈希作为缓存键的一部分"""
+    return repr([(name, member._value_) for name, member in LexicalType.__members__.items()])
+
+# 关键字、运算符、界符映射（模块加载时构建一次，避免每个词法元素都重建）
+_KEYWORD_MAPPINGS = {ele.value: ele for ele in LexicalType if ele.is_keyword}
+_OPERATOR_MAPPINGS = {ele.value: ele for ele in LexicalType if ele.is_operator}
+_DELIMITER_MAPPINGS = {ele.value: ele for ele in LexicalType if ele.is_delimiter}
+_SYMBOL_MAPPINGS = {**_DELIMITER_MAPPINGS, **_OPERATOR_MAPPINGS}
+_SYMBOL_BYTES_MAPPINGS = {symbol.encode('ascii'): (type_, symbol) for symbol, type_ in _SYMBOL_MAPPINGS.items()} # 字节引擎使用
+# 转义字符字符串与转义字符实体映射
+_ESCAPE_MAPPINGS = {
+    'n': '\n',
+    't': '\t',
+    'r': '\r',
+    '\\': '\\',
+    '"': '"',
+    "'": "'",
+    '0': '\0'
+}
+_ESCAPE_PATTERN = re.compile(r'\\(.)', re.DOTALL)
+
+def _unescape(body):
+    """处理字符串中的转义，未知转义保持原样（与逐字符引擎一致）"""
+    return _ESCAPE_PATTERN.sub(lambda m: _ESCAPE_MAPPINGS.get(m.group(1), m.group()), body)
+
+_NEWLINE_PATTERN = re.compile('\n')
+_NEWLINE_BYTES_PATTERN = re.compile(b'\n')
+
+_MASTER_PATTERN = None # 组合正则缓存
+
+def _master_pattern():
+    """由LexicalType构建组合正则，每个进程只编译一次"""
+    global _MASTER_PATTERN
+    if _MASTER_PATTERN is None:
+        # 运算符与界符按长度降序排列，保证最长匹配（与逐字符引擎的三/二/一字符试探一致）
+        symbols = sorted(_SYMBOL_MAPPINGS, key=len, reverse=True)
+        _MASTER_PATTERN = re.compile('|'.join([
+            r'(?P<WHITESPACE>\s+)',                           # 空白
+            r'(?P<LINE_COMMENT>//[^\n]*)',                    # 单行注释
+            r'(?P<BLOCK_COMMENT>/\*.*?\*/)',                  # 多行注释
+            r'(?P<UNTERMINATED_COMMENT>/\*)',                 # 未结束的多行注释
+            r'(?P<NUMBER>\d+(?:\.\d+)?)',                     # 数字
+            r'(?P<STRING>"(?:[^"\\]|\\.)*")',                  # 字符串
+            r'(?P<UNTERMINATED_STRING>")',                    # 未结束的字符串
+            r'(?P<IDENTIFIER>[^\W\d]\w*)',                    # 标识符和关键字
+            f"(?P<SYMBOL>{'|'.join(map(re.escape, symbols))})", # 运算符和界符
+            r'(?P<UNKNOWN>.)',                                # 其他
+        ]), re.DOTALL)
+    return _MASTER_PATTERN
+
+def _line_end(text, pos):
+    """pos所在行的行尾位置（不含换行符）"""
+    end = text.find('\n', pos)
+    return len(text) if end < 0 else end
+
+def _last_token_at(tokens, offset):
+    """二分查找偏移不超过offset的最后一个词法元素的下标，没有时为-1（bisect的key参数需要Python 3.10）"""
+    lo, hi = 0, len(tokens)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if tokens[mid].offset <= offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo - 1
+
+def _iter_chunks(source, chunk_size=1 << 16):
+    """将字符串、文件对象或文本块的可迭代对象统一为文本块迭代器，字节块按UTF-8增量解码"""
+    if isinstance(source, str):
+        yield source
+        return
+    if hasattr(source, 'read'): # 文件对象
+        file = source
+        source = iter(lambda: file.read(chunk_size), file.read(0))
+    decoder = None
+    for chunk in source:
+        if isinstance(chunk, (bytes, bytearray)):
+            decoder = decoder or codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder:
+        yield decoder.decode(b'', final=True)
+
+_MASTER_BYTES_PATTERN = None # 字节版组合正则缓存
+
+def _master_bytes_pattern():
+    """由LexicalType构建ASCII字节版组合正则，供直接分析UTF-8字节使用，每个进程只编译一次"""
+    global _MASTER_BYTES_PATTERN
+    if _MASTER_BYTES_PATTERN is None:
+        symbols = sorted(_SYMBOL_MAPPINGS, key=len, reverse=True)
+        _MASTER_BYTES_PATTERN = re.compile(b'|'.join([
+            rb'(?P<NEWLINES>[\t\x0b\x0c\r\x1c-\x1f ]*\n[\t\n\x0b\x0c\r\x1c-\x1f ]*)', # 含换行的ASCII空白（与str.isspace一致）
+            rb'(?P<WHITESPACE>[\t\x0b\x0c\r\x1c-\x1f ]+)',          # 不含换行的ASCII空白
+            rb'(?P<LINE_COMMENT>//[^\n]*)',                      # 单行注释
+            rb'(?P<BLOCK_COMMENT>/\*.*?\*/)',                    # 多行注释
+            rb'(?P<UNTERMINATED_COMMENT>/\*)',                   # 未结束的多行注释
+            rb'(?P<NUMBER>[0-9]+(?:\.[0-9]+)?)',                 # 数字
+            rb'(?P<STRING>"(?:[^"\\]|\\.)*")',                    # 字符串
+            rb'(?P<UNTERMINATED_STRING>")',                      # 未结束的字符串
+            rb'(?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*)',          # 标识符和关键字
+            b'(?P<SYMBOL>' + b'|'.join(re.escape(symbol.encode('ascii')) for symbol in symbols) + b')', # 运算符和界符
+            rb'(?P<UNKNOWN>.)',                                  # 其他（含非ASCII字节）
+        ]), re.DOTALL)
+    return _MASTER_BYTES_PATTERN
+
+def _iter_byte_lines(buffer):
+    """按行解码字节缓冲区，与str.split('\\n')的切分方式一致"""
+    start = 0
+    for match in _NEWLINE_BYTES_PATTERN.finditer(buffer):
+        yield bytes(buffer[start:match.start()]).decode('utf-8', 'replace')
+        start = match.end()
+    yield bytes(buffer[start:]).decode('utf-8', 'replace')
+
+# 含非ASCII字符的词法元素所在的窗口：字母、数字、下划线、非ASCII字节，以及后面紧跟数字或非ASCII字节的'.'
+# 窗口之后的字节是ASCII且不能延续窗口中最后一个词法元素，窗口可以单独解码并分析
+_NON_ASCII_WINDOW_PATTERN = re.compile(rb'(?:[A-Za-z0-9_\x80-\xff]|\.(?=[0-9\x80-\xff]))+')
+
+def _register_byte_rest(buffer, start, offset, index):
+    """
+    从字节位置start起逐行解码到缓冲区末尾并登记换行，每次只复制一行，用于报告直到文件结束都没有闭合的错误
+
+    :param start: 起始字节位置
+    :param offset: 起始位置的字符偏移
+    :return: (start所在行行尾的字符偏移, 缓冲区末尾的字符偏移)
+    """
+    line_end = None
+    pos = start
+    for match in _NEWLINE_BYTES_PATTERN.finditer(buffer, start):
+        offset += len(bytes(buffer[pos:match.start()]).decode('utf-8', 'replace'))
+        if line_end is None:
+            line_end = offset
+        offset += 1
+        index.line_starts.append(offset)
+        pos = match.end()
+    offset += len(bytes(buffer[pos:]).decode('utf-8', 'replace'))
+    return offset if line_end is None else line_end, offset
+
+def _register_chunks(chunks, index):
+    """在文本块被读取时依次向LineIndex登记其中的换行"""
+    offset = 0
+    for chunk in chunks:
+        index.add_text(chunk, offset)
+        offset += len(chunk)
+        yield chunk
+
+def compute_edit(old_text, new_text):
+    """
+    比较编辑前后的源代码，去掉公共前缀和后缀，得到覆盖全部差异的一次编辑
+
+    :return: (offset, deleted, inserted)
+    """
+    limit = min(len(old_text), len(new_text))
+    prefix = 0
+    while prefix < limit and old_text[prefix] == new_text[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_text[-1 - suffix] == new_text[-1 - suffix]:
+        suffix += 1
+    return prefix, len(old_text) - prefix - suffix, new_text[prefix:len(new_text) - suffix]
+
+class StringPool:
+    """
+    字符串池：一次编译中相同的标识符和字符串字面量只保存一份，并按首次出现顺序分配从0开始的编号
+    目前只用于驻留：词法元素的值改为池中的同一个字符串对象，编号随元素记录在string_id中；
+    符号表和语义检查仍以名称字符串为键，不读取编号
+    """
+    def __init__(self):
+        self.strings = [] # 编号 -> 字符串
+        self.ids = {}     # 字符串 -> 编号
+
+    def intern(self, text):
+        """返回字符串的编号，首次出现时加入字符串池"""
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def __getitem__(self, string_id):
+        return self.strings[string_id]
+
+    def __len__(self):
+        return len(self.strings)
+
+class LineIndex:
+    """行起始位置索引：记录每一行的起始字符偏移，按偏移二分查找行号和列号"""
+    def __init__(self, text=''):
+        self.line_starts = array('q', [0]) # 各行起始偏移，第1行从0开始
+        self.add_text(text, 0)
+
+    def add_text(self, text, base):
+        """
+        登记一段文本中的换行，需按偏移从小到大依次登记
+
+        :param text: 文本（str，或按字符即字节的ASCII bytes）
+        :param base: 文本在整个输入中的起始偏移
+        """
+        newline = _NEWLINE_PATTERN if isinstance(text, str) else _NEWLINE_BYTES_PATTERN
+        self.line_starts.extend(base + match.end() for match in newline.finditer(text))
+
+    def edited(self, offset, deleted, inserted):
+        """
+        返回源代码经过一次编辑后的LineIndex，编辑位置之前的行起始偏移直接复用，之后的整体平移
+
+        :param offset: 编辑位置
+        :param deleted: 删除的字符数
+        :param inserted: 插入的文本
+        """
+        starts = self.line_starts
+        lo = bisect_right(starts, offset) # 换行在编辑位置之前的行保持不变
+        hi = bisect_right(starts, offset + deleted) # 换行被删除的行
+        delta = len(inserted) - deleted
+        index = LineIndex()
+        index.line_starts = starts[:lo]
+        index.add_text(inserted, offset)
+        index.line_starts.extend(start + delta for start in starts[hi:])
+        return index
+
+    def line_of(self, offset):
+        """偏移所在行号"""
+        return bisect_right(self.line_starts, offset)
+
+    def column_of(self, offset):
+        """偏移所在列号"""
+        return offset - self.line_starts[bisect_right(self.line_starts, offset) - 1] + 1
+
+    def position(self, offset):
+        """偏移对应的（行号，列号）"""
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
 class LexicalElement:
     """词汇元素"""
-    def __init__(self, type_: LexicalType, value_=None, row_=None, col_=None):
+    _line = None   # 显式指定的行号
+    _column = None # 显式指定的列号
+    string_id = None # 标识符和字符串字面量在StringPool中的编号（目前没有使用方读取）
+
+    def __init__(self, type_: LexicalType, value_=None, row_=None, col_=None, offset_=None, index_=None):
+        """
+        位置可以显式给出行列号，也可以只给出字符偏移和行索引，行列号在访问时再计算
+
+        :param offset_: 在源代码中的字符偏移（按标识符起始位置）
+        :param index_: 源代码的LineIndex
+        """
         self.type: LexicalType = type_
         self.value = value_
-        self.line = row_ # 所在行号
-        self.column = col_ # 所在列号（按标识符起始位置）
+        self.offset = offset_
+        self._index = index_
+        if row_ is not None:
+            self._line = row_
+        if col_ is not None:
+            self._column = col_
+
+    @property
+    def line(self):
+        """所在行号"""
+        if self._line is not None or self._index is None:
+            return self._line
+        return bisect_right(self._index.line_starts, self.offset)
+
+    @line.setter
+    def line(self, value):
+        self._line = value
+
+    @property
+    def column(self):
+        """所在列号（按标识符起始位置）"""
+        if self._column is not None or self._index is None:
+            return self._column
+        return self._index.column_of(self.offset)
+
+    @column.setter
+    def column(self, value):
+        self._column = value
     
     def __str__(self):
         # 序列化：[Type:value]（值为空时省略:value）
         return f"[{self.type.name}]" if self.value is None else f"[{self.type.name}:{self.value}]"
 
+_TOKEN_KINDS = list(LexicalType) # TokenBuffer中的类型编号
+_TOKEN_KIND_IDS = {kind: i for i, kind in enumerate(_TOKEN_KINDS)}
+
+class TokenView:
+    """TokenBuffer中一个词法元素的轻量视图，接口与LexicalElement一致"""
+    __slots__ = ('_buffer', '_i')
+
+    def __init__(self, buffer, i):
+        self._buffer = buffer
+        self._i = i
+
+    @property
+    def type(self):
+        return _TOKEN_KINDS[self._buffer.kinds[self._i]]
+
+    @property
+    def value(self):
+        return self._buffer.values[self._buffer.value_ids[self._i]]
+
+    @property
+    def offset(self):
+        return self._buffer.starts[self._i]
+
+    @property
+    def length(self):
+        """在源代码中的字符数"""
+        return self._buffer.lengths[self._i]
+
+    @property
+    def line(self):
+        return bisect_right(self._buffer.index.line_starts, self._buffer.starts[self._i])
+
+    @property
+    def column(self):
+        return self._buffer.index.column_of(self._buffer.starts[self._i])
+
+    @property
+    def string_id(self):
+        """标识符和字符串字面量在StringPool中的编号，其他元素或TokenBuffer没有字符串池时为None"""
+        strings = self._buffer.strings
+        if strings is None or self.type not in (LexicalType.IDENTIFIER, LexicalType.STRING):
+            return None
+        return strings.ids[self.value]
+
+    __str__ = LexicalElement.__str__
+
+class TokenBuffer:
+    """
+    紧凑的词法元素序列：按列保存类型编号、起始偏移、长度和值编号，值去重后保存在values中
+    下标访问和迭代得到TokenView，可以直接交给SyntaxParser.parse
+    """
+    def __init__(self, index=None, strings=None):
+        """
+        :param index: 源代码的LineIndex
+        :param strings: 标识符和字符串字面量所在的StringPool，TokenView.string_id据此给出编号
+        """
+        self.kinds = array('i')     # 类型编号
+        self.starts = array('q')    # 起始偏移
+        self.lengths = array('i')   # 长度
+        self.value_ids = array('i') # 值在values中的编号
+        self.values = []            # 去重后的值
+        self.index = index if index is not None else LineIndex()
+        self.strings = strings
+        self._value_ids = {}        # (值的类型, 值) -> 编号，区分1和1.0
+
+    def append(self, type_, value, start, length):
+        """追加一个词法元素"""
+        key = (value.__class__, value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        self.kinds.append(_TOKEN_KIND_IDS[type_])
+        self.starts.append(start)
+        self.lengths.append(length)
+        self.value_ids.append(value_id)
+
+    def extend(self, spans):
+        """
+        依次追加(类型, 值, 起始偏移, 结束偏移)，有字符串池时标识符和字符串的值放入池中，返回self
+
+        :param spans: 词法引擎产出的(类型, 值, 起始偏移, 结束偏移)的可迭代对象
+        """
+        kinds, starts, lengths, value_ids = self.kinds.append, self.starts.append, self.lengths.append, self.value_ids.append
+        values, known, kind_ids = self.values, self._value_ids, _TOKEN_KIND_IDS
+        pooled = (LexicalType.IDENTIFIER, LexicalType.STRING) if self.strings is not None else ()
+        for type_, value, start, end in spans:
+            if type_ in pooled:
+                value = self.strings.strings[self.strings.intern(value)]
+            key = (value.__class__, value)
+            value_id = known.get(key)
+            if value_id is None:
+                value_id = known[key] = len(values)
+                values.append(value)
+            kinds(kind_ids[type_])
+            starts(start)
+            lengths(end - start)
+            value_ids(value_id)
+        return self
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [TokenView(self, j) for j in range(*i.indices(len(self.kinds)))]
+        if i < 0:
+            i += len(self.kinds)
+        if not 0 <= i < len(self.kinds):
+            raise IndexError("TokenBuffer index out of range")
+        return TokenView(self, i)
+
+    def __iter__(self):
+        return map(TokenView, repeat(self), range(len(self.kinds)))
+
+    def __getstate__(self):
+        # 去重表可由values重建，不参与序列化
+        state = self.__dict__.copy()
+        del state['_value_ids']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._value_ids = {(value.__class__, value): i for i, value in enumerate(self.values)}
+
+class LexicalError(Exception):
+    """词法错误，记录出错范围，恢复模式下该范围作为ERROR元素跳过"""
+    def __init__(self, message, line, column, start, end):
+        """
+        :param message: 错误信息（含行列号）
+        :param start: 出错范围的起始偏移
+        :param end: 出错范围的结束偏移，即恢复模式下继续分析的同步点
+        """
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.start = start
+        self.end = end
+
+    def __str__(self):
+        return self.message
+
+    def __reduce__(self): # 支持跨进程传递
+        return LexicalError, (self.message, self.line, self.column, self.start, self.end)
+
 class Tokenize:
     """词法分析器"""
-    def _error(self, msg):
-        message = f"LexicalParser error at line {self._current_row}, column {self._current_col}: {msg}"
+    ENGINES = ('char', 'regex', 'dfa') # 可选的分析引擎
+
+    def __init__(self, engine='char', recover=False, cache=None):
+        """
+        :param engine: 分析引擎，'char'为逐字符分析，'regex'为组合正则分析，'dfa'为生成的DFA转移表分析
+        :param recover: 恢复模式，出错时记录到diagnostics并产出ERROR元素，从同步点继续分析，一次报告全部词法错误
+        :param cache: 可选的TokenCache，analyse命中时不再进行词法分析
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown lexer engine: {engine}")
+        self.engine = engine
+        self.recover = recover
+        self.cache = cache
+        self.diagnostics = [] # 恢复模式下记录的LexicalError，每次完整分析时清空
+        self.strings = StringPool() # 字符串池，每次完整分析时重建，增量分析沿用
+
+    def _error(self, msg, offset=None, start=None, end=None):
+        """
+        报告词法错误，行列号由偏移经行索引计算
+
+        :param offset: 报告位置的字符偏移，默认为当前位置
+        :param start: 出错范围的起始偏移，默认为报告位置
+        :param end: 出错范围的结束偏移（同步点），默认为报告位置，且至少跳过一个字符
+        """
+        if offset is None:
+            offset = self._offset_base + self._current_pos
+        if start is None:
+            start = offset
+        if end is None:
+            end = max(offset, start + 1)
+        row, col = self._line_index.position(offset)
+        message = f"LexicalParser error at line {row}, column {col}: {msg}"
         logger.error(message)
-        raise Exception(message)
-    
+        raise LexicalError(message, row, col, start, end)
+
+    def _unterminated_string(self, start, end, eof):
+        """
+        报告未结束的字符串：恢复模式下在开始的引号处报告，使诊断按位置排序；否则与以往一样在文件末尾报告
+
+        :param start: 开始的引号的偏移
+        :param end: 出错范围的结束偏移（引号所在行的行尾）
+        :param eof: 文件末尾的偏移
+        """
+        self._error("Unterminated string literal", start if self.recover else eof, start, end)
+
+    def _intern(self, element):
+        """将标识符或字符串字面量的值放入字符串池，元素记录编号并改用池中的字符串"""
+        element.string_id = string_id = self.strings.intern(element.value)
+        element.value = self.strings.strings[string_id]
+        return element
+
+    def _element(self, type_, value, pos):
+        """在输入文本的pos处创建LexicalElement"""
+        return LexicalElement(type_, value, offset_=self._offset_base + pos, index_=self._line_index)
+
     def _move_next(self):
         """移动到下一个字符"""
-        if self._current_char == '\n': # 换行
-            self._current_row += 1
-            self._current_col = 0
         self._current_pos += 1
-        self._current_col += 1
         self._current_char = self._input_text[self._current_pos] if self._current_pos < len(self._input_text) else None # 刷新char
 
     def _peek_next(self, n=1):
@@ -160,25 +630,22 @@ class Tokenize:
                 self._move_next()
         # 多行注释
         elif self._current_char == '/' and self._peek_next() == '*':
+            start = self._offset_base + self._current_pos
             # 跳过/*
             self._move_next()
             self._move_next()
             # 跳过内容，直到*/
             while self._current_char is not None and (self._current_char != '*' or self._peek_next() != '/'):
-                if self._current_char == '\n':
-                    self._current_row += 1
-                    self._current_col = 0
                 self._move_next()
             if self._current_char is None: # 如果直到文件结束都没有找到*/，报错
-                self._error("Unterminated multi-line comment")
+                self._error("Unterminated multi-line comment", start=start)
             # 跳过*/
             self._move_next()
             self._move_next()
 
     def _process_number(self):
         """处理数字"""
-        start_row = self._current_row # 缓存起始行号
-        start_col = self._current_col # 缓存起始列号
+        start = self._current_pos # 缓存起始位置
         buffer = '' # 存储数字字符串
         is_float = False # 是否是浮点数
 
@@ -187,7 +654,7 @@ class Tokenize:
             buffer += self._current_char
             self._move_next()
         # 取小数部分（如果有小数点且小数点后是数字）
-        if self._current_char == '.' and self._peek_next().isdigit():
+        if self._current_char == '.' and (self._peek_next() or '').isdigit():
             is_float = True # 标记浮点数
             buffer += self._current_char # 取小数点
             self._move_next() # 跳过小数点
@@ -197,23 +664,13 @@ class Tokenize:
         # 数字解析
         try:
             value = float(buffer) if is_float else int(buffer)
-            return LexicalElement(LexicalType.FLOAT if is_float else LexicalType.INTEGER, value, start_row, start_col)
+            return self._element(LexicalType.FLOAT if is_float else LexicalType.INTEGER, value, start)
         except ValueError: # 数字解析失败
-            self._error(f"Invalid numeric literal: {buffer}")
+            self._error(f"Invalid numeric literal: {buffer}", start=self._offset_base + start)
 
     def _process_string(self):
         """处理字符串"""
-        start_row = self._current_row # 缓存起始行号
-        start_col = self._current_col # 缓存起始列号
-        escape_mappings = { # 转义字符字符串与转义字符实体映射
-            'n': '\n',
-            't': '\t',
-            'r': '\r',
-            '\\': '\\',
-            '"': '"',
-            "'": "'",
-            '0': '\0'
-        }
+        start = self._current_pos # 缓存起始位置
         buffer = [] # 存储字符串
 
         self._move_next() # 跳过开始的引号
@@ -225,19 +682,18 @@ class Tokenize:
                 if not self._current_char: # 如果文件结束，退出
                     break
                 # 获取转义字符实体，未知转义字符将不会进行转义，直接输出原字符
-                buffer.append(escape_mappings.get(self._current_char, f"\\{self._current_char}"))
+                buffer.append(_ESCAPE_MAPPINGS.get(self._current_char, f"\\{self._current_char}"))
             self._move_next()
-        if self._current_char is None: # 如果直到文件结束都没有找到"，报错
-            self._error("Unterminated string literal")
+        if self._current_char is None: # 如果直到文件结束都没有找到"，报错，出错范围到该行行尾
+            self._unterminated_string(self._offset_base + start, self._offset_base + _line_end(self._input_text, start),
+                                      self._offset_base + self._current_pos)
         self._move_next() # 跳过结束的引号
         # 返回字符串元素
-        return LexicalElement(LexicalType.STRING, ''.join(buffer), start_row, start_col)
+        return self._intern(self._element(LexicalType.STRING, ''.join(buffer), start))
     
     def _process_identifier(self):
         """处理标识符/关键字"""
-        start_row = self._current_row # 缓存起始行号
-        start_col = self._current_col # 缓存起始列号
-        keyword_mappings = {ele.value: ele for ele in LexicalType if ele.is_keyword} # 关键字映射
+        start = self._current_pos # 缓存起始位置
         buffer = [] # 存储标识符
 
         # 匹配标识符，允许字母数字下划线
@@ -245,57 +701,55 @@ class Tokenize:
             buffer.append(self._current_char)
             self._move_next()
         identifier = ''.join(buffer) # 拼接成字符串
-        lexical_type = keyword_mappings.get(identifier, LexicalType.IDENTIFIER) # 是否是关键字
-        return LexicalElement(lexical_type, identifier, start_row, start_col)
+        lexical_type = _KEYWORD_MAPPINGS.get(identifier, LexicalType.IDENTIFIER) # 是否是关键字
+        if lexical_type == LexicalType.IDENTIFIER:
+            return self._intern(self._element(lexical_type, identifier, start))
+        return self._element(lexical_type, identifier, start)
     
     def _process_operator(self):
         """处理运算符"""
-        start_row = self._current_row # 缓存起始行号
-        start_col = self._current_col # 缓存起始列号
-        operator_mappings = {ele.value: ele for ele in LexicalType if ele.is_operator} # 运算符映射
+        start = self._current_pos # 缓存起始位置
 
         # 尝试匹配三字符运算符
         if self._current_char and self._peek_next() and self._peek_next(2):
             op = self._current_char + self._peek_next() + self._peek_next(2)
-            if op in operator_mappings: # 如果是三字符运算符
+            if op in _OPERATOR_MAPPINGS: # 如果是三字符运算符
                 self._move_next()
                 self._move_next()
                 self._move_next()
-                return LexicalElement(operator_mappings[op], op, start_row, start_col)
+                return self._element(_OPERATOR_MAPPINGS[op], op, start)
         # 尝试匹配双字符运算符
         if self._current_char and self._peek_next(): # 如果有足够的字符
             op = self._current_char + self._peek_next()
-            if op in operator_mappings: # 如果是双字符运算符
+            if op in _OPERATOR_MAPPINGS: # 如果是双字符运算符
                 self._move_next()
                 self._move_next()
-                return LexicalElement(operator_mappings[op], op, start_row, start_col)
+                return self._element(_OPERATOR_MAPPINGS[op], op, start)
             if op == '->': # 如果是->，退出，将转_process_delimiters处理
                 return None
         # 单字符运算符处理
-        if self._current_char in operator_mappings:
+        if self._current_char in _OPERATOR_MAPPINGS:
             op = self._current_char
             self._move_next()
-            return LexicalElement(operator_mappings[op], op, start_row, start_col)
+            return self._element(_OPERATOR_MAPPINGS[op], op, start)
         return None
 
     def _process_delimiters(self):
         """处理界符，返回对应的LexicalElement"""
-        start_row = self._current_row # 缓存起始行号
-        start_col = self._current_col # 缓存起始列号
-        delimiter_mappings = {ele.value: ele for ele in LexicalType if ele.is_delimiter} # 界符映射
+        start = self._current_pos # 缓存起始位置
 
         # 双字符界符检查
         if self._current_char and self._peek_next():
             str = self._current_char + self._peek_next()
-            if str in delimiter_mappings:
+            if str in _DELIMITER_MAPPINGS:
                 self._move_next()
                 self._move_next()
-                return LexicalElement(delimiter_mappings[str], str, start_row, start_col)
+                return self._element(_DELIMITER_MAPPINGS[str], str, start)
         # 单字符界符检查
-        if self._current_char in delimiter_mappings:
+        if self._current_char in _DELIMITER_MAPPINGS:
             str = self._current_char
             self._move_next()
-            return LexicalElement(delimiter_mappings[str], str, start_row, start_col)
+            return self._element(_DELIMITER_MAPPINGS[str], str, start)
         return None
 
     def _get_next_element(self):
@@ -319,10 +773,17 @@ class Tokenize:
                 return delimiter_token
             self._error(f"Unknown character: {self._current_char}")      # 其他
         # 文件结束
-        return LexicalElement(LexicalType.EOF, None, self._current_row, self._current_col)
+        return self._element(LexicalType.EOF, None, self._current_pos)
     
-    def _log_parsing_result(self, elements):
-        """输出词法分析结果"""
+    def _log_parsing_result(self, elements, lines):
+        """
+        输出词法分析结果
+
+        :param elements: LexicalElement列表
+        :param lines: 源代码各行
+        """
+        if not logger.isEnabledFor(logging.INFO): # 不输出时跳过按行分组
+            return
         from collections import defaultdict
         results = defaultdict(list) # 创建一个默认字典，用于存储行号和对应的LexicalElement列表
         for element in elements:
@@ -330,31 +791,422 @@ class Tokenize:
 
         # 打印
         logger.info("====== LEXER RESULT START ======")
-        for row_num, code_line in enumerate(self._input_text.split('\n'), 1):
+        for row_num, code_line in enumerate(lines, 1):
             logger.info(f"{row_num:4d} | {code_line}")
             if row_num in results: # 如果该行有LexicalElement
                 logger.info(f"      -> {' '.join([str(token) for token in results[row_num]])}")
         logger.info("======= LEXER RESULT END =======")
 
+    def _scan_chars(self):
+        """逐字符引擎：通过_move_next/_peek_next逐个字符分析"""
+        elements = []
+        while True:
+            elements.append(self._get_next_element())
+            if elements[-1].type == LexicalType.EOF: # 如果是文件结束符，结束循环
+                break
+        return elements
+
+    def _reset(self, text, index, base=0):
+        """
+        重置逐字符引擎状态
+
+        :param text: 输入文本
+        :param index: 输入的LineIndex
+        :param base: 输入文本在整个源代码中的起始偏移
+        """
+        self._input_text = text # 输入文本
+        self._line_index = index # 行索引
+        self._offset_base = base # 起始偏移
+        self._current_pos = 0 # 当前位置
+        self._current_char = text[0] if text else None # 当前字符
+
+    def _process_number_at(self, text, pos, index, base):
+        """从指定位置按逐字符引擎处理数字"""
+        self._reset(text, index, base)
+        self._current_pos = pos
+        self._current_char = text[pos]
+        return self._process_number()
+
+    def _iter_regex(self, chunks, index, base=0, pos=0):
+        """组合正则引擎：逐个产出LexicalElement，参数同_iter_spans"""
+        return self._iter_elements(self._iter_spans(chunks, index, base, pos), index)
+
+    def _iter_dfa(self, text, index, pos=0):
+        """DFA引擎：逐个产出LexicalElement，转移表由compiler_lexer_dfa生成并缓存"""
+        from compiler_lexer_dfa import load_lexer_dfa # 按需导入，避免循环导入
+        return self._iter_elements(load_lexer_dfa().iter_spans(self, text, index, pos), index)
+
+    def _iter_chars(self, text, index, pos=0):
+        """逐字符引擎：从pos开始逐个产出LexicalElement"""
+        self._reset(text, index)
+        self._current_pos = pos
+        self._current_char = text[pos] if pos < len(text) else None
+        while True:
+            element = self._get_next_element()
+            yield element
+            if element.type == LexicalType.EOF:
+                break
+
+    def _iter_engine(self, text, index, pos=0):
+        """当前引擎：从pos（须位于词法元素边界）开始逐个产出LexicalElement"""
+        if self.engine == 'regex':
+            return self._iter_regex((text,), index, 0, pos)
+        if self.engine == 'dfa':
+            return self._iter_dfa(text, index, pos)
+        return self._iter_chars(text, index, pos)
+
+    def _iter_char_spans(self, text, index, pos=0):
+        """逐字符引擎：从pos开始逐个产出(类型, 值, 起始偏移, 结束偏移)"""
+        for element in self._iter_chars(text, index, pos):
+            yield element.type, element.value, element.offset, self._offset_base + self._current_pos
+
+    def _iter_engine_spans(self, text, index, pos=0):
+        """当前引擎：从pos（须位于词法元素边界）开始逐个产出(类型, 值, 起始偏移, 结束偏移)"""
+        if self.engine == 'regex':
+            return self._iter_spans((text,), index, 0, pos)
+        if self.engine == 'dfa':
+            from compiler_lexer_dfa import load_lexer_dfa # 按需导入，避免循环导入
+            return load_lexer_dfa().iter_spans(self, text, index, pos)
+        return self._iter_char_spans(text, index, pos)
+
+    def _iter_recovering(self, text, index):
+        """恢复模式：逐个产出LexicalElement，见_iter_recovering_spans"""
+        return self._iter_elements(self._iter_recovering_spans(text, index), index)
+
+    def _iter_recovering_spans(self, text, index):
+        """
+        恢复模式：出错时记录诊断信息，产出覆盖出错范围的ERROR元素，再从同步点用当前引擎继续分析，
+        逐个产出(类型, 值, 起始偏移, 结束偏移)
+        同步点：未知字符和非法数字之后、未结束字符串所在行的行尾、未结束的多行注释直到文件结束
+        """
+        pos = 0
+        while True:
+            try:
+                yield from self._iter_engine_spans(text, index, pos)
+                return
+            except LexicalError as error:
+                self.diagnostics.append(error)
+            diagnostic = self.diagnostics[-1]
+            yield LexicalType.ERROR, text[diagnostic.start:diagnostic.end], diagnostic.start, diagnostic.end
+            pos = diagnostic.end
+
+    def _iter_elements(self, spans, index):
+        """将(类型, 值, 起始偏移, 结束偏移)转换为LexicalElement，标识符和字符串放入字符串池"""
+        for type_, value, start, _ in spans:
+            if type_ is LexicalType.IDENTIFIER or type_ is LexicalType.STRING:
+                yield self._intern(LexicalElement(type_, value, None, None, start, index))
+            else:
+                yield LexicalElement(type_, value, None, None, start, index)
+
+    def _iter_spans(self, chunks, index, base=0, pos=0):
+        """
+        组合正则引擎：用一个组合正则的finditer切分输入，逐个产出(类型, 值, 起始偏移, 结束偏移)
+
+        :param chunks: 输入文本块的可迭代对象，词法元素可以跨块
+        :param index: 输入的LineIndex（换行由调用方登记），行列号由其按需计算
+        :param base: 输入在整个源代码中的起始偏移
+        :param pos: 从第一个文本块的该位置开始分析（须位于词法元素边界）
+        """
+        self._line_index = index
+        pattern = _master_pattern()
+        chunks = iter(chunks)
+        buffer = next(chunks, '') # 当前缓冲区
+        pending = next(chunks, None) # 下一个文本块，None表示缓冲区已包含全部剩余输入
+        while True:
+            final = pending is None
+            safe_end = len(buffer) - 2 # 非最后一块时，匹配结尾之后至少保留两个字符，保证最长匹配不被块边界截断
+            for match in pattern.finditer(buffer, pos):
+                kind = match.lastgroup
+                if not final and (match.end() > safe_end or kind == 'UNTERMINATED_COMMENT' or kind == 'UNTERMINATED_STRING'):
+                    break # 可能被块边界截断，等待下一块
+                if kind == 'WHITESPACE' or kind == 'LINE_COMMENT' or kind == 'BLOCK_COMMENT': # 忽略空白和注释
+                    pos = match.end()
+                    continue
+                start = match.start()
+                if kind == 'IDENTIFIER': # 标识符和关键字
+                    identifier = match.group()
+                    first = identifier[0]
+                    if not first.isalpha() and first != '_': # \w还包含数字字符，开头须与逐字符引擎一致
+                        if not first.isdigit(): # 非数字的数值字符（如½），逐字符引擎不接受
+                            self._error(f"Unknown character: {first}", base + start)
+                        if not final: # 非十进制数字字符（如²）交由逐字符引擎按数字处理并报错，需要完整的数字，等待后续输入
+                            break
+                        self._process_number_at(buffer, start, index, base)
+                    yield _KEYWORD_MAPPINGS.get(identifier, LexicalType.IDENTIFIER), identifier, base + start, base + match.end()
+                elif kind == 'SYMBOL': # 运算符和界符
+                    symbol = match.group()
+                    yield _SYMBOL_MAPPINGS[symbol], symbol, base + start, base + match.end()
+                elif kind == 'NUMBER': # 数字
+                    number = match.group()
+                    end = match.end()
+                    if buffer[end:end + 1].isdigit() or (buffer[end:end + 1] == '.' and buffer[end + 1:end + 2].isdigit()):
+                        if not final: # 数字后紧跟非十进制数字字符，同上
+                            break
+                        self._process_number_at(buffer, start, index, base)
+                    if '.' in number:
+                        yield LexicalType.FLOAT, float(number), base + start, base + end
+                    else:
+                        yield LexicalType.INTEGER, int(number), base + start, base + end
+                elif kind == 'STRING': # 字符串，处理转义后去掉两侧引号
+                    body = match.group()[1:-1]
+                    if '\\' in body:
+                        body = _unescape(body)
+                    yield LexicalType.STRING, body, base + start, base + match.end()
+                elif kind == 'UNKNOWN': # 其他
+                    self._error(f"Unknown character: {match.group()}", base + start)
+                # 直到文件结束都没有闭合，报错位置与逐字符引擎一致
+                elif kind == 'UNTERMINATED_COMMENT':
+                    self._error("Unterminated multi-line comment", base + len(buffer), base + start)
+                else:
+                    self._unterminated_string(base + start, base + _line_end(buffer, start), base + len(buffer))
+                pos = match.end()
+            if final:
+                break
+            # 丢弃已处理部分，拼接下一块
+            buffer = buffer[pos:] + pending
+            base += pos
+            pos = 0
+            pending = next(chunks, None)
+        # 文件结束
+        yield LexicalType.EOF, None, base + len(buffer), base + len(buffer)
+
+    def _iter_bytes(self, buffer, index):
+        """
+        字节引擎：直接在UTF-8字节缓冲区上匹配，逐个产出(类型, 值, 起始偏移, 结束偏移)，偏移按字符计
+
+        词法表中的符号全部是ASCII，只有标识符、字符串和注释需要解码；遇到含非ASCII字符的词法元素（如Unicode标识符）时，
+        只解码该元素所在的窗口（见_NON_ASCII_WINDOW_PATTERN）交给组合正则引擎分析，之后继续按字节匹配
+
+        :param buffer: bytes、bytearray、memoryview或mmap
+        :param index: 登记换行的LineIndex
+        """
+        self._line_index = index
+        pattern = _master_bytes_pattern()
+        words = {} # 已出现的ASCII标识符和关键字的字节 -> (类型, 字符串)，重复出现时不再解码
+        size = len(buffer)
+        adjust = 0 # 已处理部分中UTF-8后续字节的数量，字节偏移减去该值即为字符偏移
+        pos = 0
+        while True:
+            for match in pattern.finditer(buffer, pos):
+                kind = match.lastgroup
+                if kind == 'WHITESPACE':
+                    continue
+                if kind == 'NEWLINES':
+                    index.add_text(match.group(), match.start() - adjust)
+                    continue
+                start, end = match.span()
+                offset = start - adjust
+                if kind == 'IDENTIFIER': # 标识符和关键字，紧跟非ASCII字节时标识符可能继续
+                    if end < size and buffer[end] >= 0x80:
+                        break
+                    word = match.group()
+                    known = words.get(word)
+                    if known is None:
+                        identifier = word.decode('ascii')
+                        known = words[word] = _KEYWORD_MAPPINGS.get(identifier, LexicalType.IDENTIFIER), identifier
+                    yield known[0], known[1], offset, end - adjust
+                elif kind == 'SYMBOL': # 运算符和界符
+                    type_, symbol = _SYMBOL_BYTES_MAPPINGS[match.group()]
+                    yield type_, symbol, offset, end - adjust
+                elif kind == 'NUMBER': # 数字，int/float可直接解析字节；紧跟非ASCII字节时可能含非十进制数字字符
+                    if end < size and (buffer[end] >= 0x80 or (buffer[end] == 0x2e and end + 1 < size and buffer[end + 1] >= 0x80)):
+                        break
+                    number = match.group()
+                    if b'.' in number:
+                        yield LexicalType.FLOAT, float(number), offset, end - adjust
+                    else:
+                        yield LexicalType.INTEGER, int(number), offset, end - adjust
+                elif kind == 'UNKNOWN':
+                    if buffer[start] >= 0x80: # 非ASCII字符（Unicode空白、标识符等）
+                        break
+                    self._error(f"Unknown character: {match.group().decode('ascii')}", offset)
+                elif kind == 'UNTERMINATED_COMMENT' or kind == 'UNTERMINATED_STRING': # 直到文件结束都没有闭合，报错位置与逐字符引擎一致
+                    line_end, eof = _register_byte_rest(buffer, start, offset, index)
+                    if kind == 'UNTERMINATED_COMMENT':
+                        self._error("Unterminated multi-line comment", eof, offset)
+                    self._unterminated_string(offset, line_end, eof)
+                else: # 注释、字符串：可能跨行或含非ASCII字符
+                    text = match.group()
+                    if not text.isascii(): # 非ASCII字符占多个字节，按字符登记换行并累计差值
+                        text = text.decode('utf-8', 'replace')
+                        adjust += end - start - len(text)
+                    if kind == 'STRING': # 字符串，解码后处理转义并去掉两侧引号
+                        body = text[1:-1] if isinstance(text, str) else text[1:-1].decode('ascii')
+                        if '\\' in body:
+                            body = _unescape(body)
+                        yield LexicalType.STRING, body, offset, end - adjust
+                    if b'\n' in text if isinstance(text, bytes) else '\n' in text:
+                        index.add_text(text, offset)
+            else: # 已到缓冲区末尾
+                break
+            # 含非ASCII字符的词法元素：只解码所在的窗口，用组合正则引擎分析
+            window_end = _NON_ASCII_WINDOW_PATTERN.match(buffer, start).end()
+            text = bytes(buffer[start:window_end]).decode('utf-8')
+            for span in self._iter_spans((text,), index, offset):
+                if span[0] is LexicalType.EOF:
+                    break
+                yield span
+            adjust += window_end - start - len(text)
+            pos = window_end
+        # 文件结束
+        yield LexicalType.EOF, None, size - adjust, size - adjust
+
+    def analyse_bytes(self, buffer):
+        """
+        直接分析UTF-8字节缓冲区（bytes、bytearray、memoryview或mmap），结果保存为紧凑的TokenBuffer，
+        不把整个输入解码为str，也不逐个创建LexicalElement
+
+        :param buffer: UTF-8编码的源代码字节
+        """
+        self.strings = StringPool()
+        self.diagnostics = []
+        if self.recover: # 恢复模式需要从任意位置重新开始，按解码后的文本分析
+            text = bytes(buffer).decode('utf-8')
+            index = LineIndex(text)
+            spans = self._iter_recovering_spans(text, index)
+        else:
+            index = LineIndex()
+            spans = self._iter_bytes(buffer, index)
+        tokens = TokenBuffer(index, self.strings).extend(spans)
+        self._log_parsing_result(tokens, _iter_byte_lines(buffer))
+        return tokens
+
+    def analyse_file(self, path):
+        """
+        以内存映射方式分析UTF-8源文件，不把整个文件读入为str
+
+        :param path: 源文件路径
+        """
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0: # 空文件无法映射
+                return self.analyse_bytes(b'')
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return self.analyse_bytes(buffer)
+
+    def analyse_buffer(self, source):
+        """
+        词法分析，结果保存为紧凑的TokenBuffer而不是LexicalElement列表，适合词法元素很多的输入；不输出按行分组的分析结果
+        使用当前引擎和恢复模式：组合正则引擎的非恢复模式按文本块读取输入，其余情况先拼接为完整输入；
+        TokenCache只保存LexicalElement，设置了cache时不支持
+
+        :param source: 源代码字符串、文件对象或文本块的可迭代对象
+        """
+        if self.cache is not None:
+            raise ValueError("analyse_buffer does not support the token cache")
+        self.strings = StringPool()
+        self.diagnostics = []
+        chunks = _iter_chunks(source or '')
+        if self.engine == 'regex' and not self.recover:
+            index = LineIndex()
+            spans = self._iter_spans(_register_chunks(chunks, index), index)
+        else:
+            text = ''.join(chunks)
+            index = LineIndex(text)
+            spans = self._iter_recovering_spans(text, index) if self.recover else self._iter_engine_spans(text, index)
+        return TokenBuffer(index, self.strings).extend(spans)
+
+    def iter_tokens(self, source):
+        """
+        流式词法分析，逐个产出LexicalElement，不构建完整的元素列表，也不输出按行分组的分析结果
+        组合正则引擎的非恢复模式按文本块读取输入，只保留未分析完的部分，内存与输入长度无关；
+        逐字符引擎、DFA引擎和恢复模式需要从任意位置访问输入，先把全部文本块拼接为完整输入，内存随输入长度增长
+
+        :param source: 源代码字符串、文件对象或文本块的可迭代对象
+        """
+        self.strings = StringPool()
+        self.diagnostics = []
+        chunks = _iter_chunks(source)
+        if self.engine == 'regex' and not self.recover:
+            index = LineIndex()
+            yield from self._iter_regex(_register_chunks(chunks, index), index)
+            return
+        # 逐字符引擎、DFA引擎和恢复模式需要完整输入，仍逐个产出元素，但不再是有界内存
+        text = ''.join(chunks)
+        if self.recover:
+            yield from self._iter_recovering(text, LineIndex(text))
+        elif self.engine == 'dfa':
+            yield from self._iter_dfa(text, LineIndex(text))
+        else:
+            yield from self._iter_chars(text, LineIndex(text))
+
+    def relex(self, tokens, text, offset, deleted, inserted):
+        """
+        增量词法分析：源代码经过一次编辑后，从编辑位置之前最近的安全边界开始用当前引擎重新分析，
+        直到新产出的元素与原有元素在平移后的同一位置重新对齐，其后的元素平移偏移后复用；与analyse一样输出分析结果
+
+        :param tokens: 编辑前分析得到的词法元素列表（以EOF结尾），会被就地修改
+        :param text: 编辑后的源代码
+        :param offset: 编辑位置（字符偏移）
+        :param deleted: 删除的字符数
+        :param inserted: 插入的文本
+        :return: (tokens, (start, stop))，tokens[start:stop]为重新分析得到的元素
+        """
+        eof = tokens[-1]
+        delta = len(inserted) - deleted
+        if eof.offset + delta != len(text):
+            raise ValueError("Edit does not match the edited text")
+        index = eof._index
+        edited = index.edited(offset, deleted, inserted)
+        # 最长匹配最多查看元素之后的两个字符，从偏移不超过offset-2的最后一个元素开始，其之前的元素都不受编辑影响
+        start = _last_token_at(tokens, offset - 2)
+        if start < 0:
+            start, pos = 0, 0
+        else:
+            pos = tokens[start].offset
+        # 重新分析，直到在编辑区域之后与原有元素对齐：两边都处于元素边界且之后的文本相同，其余元素必然相同
+        fresh = []
+        stop = start
+        edit_end = offset + len(inserted)
+        for token in self._iter_engine(text, edited, pos):
+            if token.offset >= edit_end:
+                old_offset = token.offset - delta
+                while tokens[stop].offset < old_offset:
+                    stop += 1
+                if tokens[stop].offset == old_offset:
+                    break
+            fresh.append(token)
+        # 分析成功后再修改，出错时原有元素保持不变
+        for token in fresh:
+            token._index = index
+        if delta:
+            for i in range(stop, len(tokens)):
+                tokens[i].offset += delta
+        index.line_starts = edited.line_starts
+        self._line_index = index
+        tokens[start:stop] = fresh
+        self._log_parsing_result(tokens, text.split('\n'))
+        return tokens, (start, start + len(fresh))
+
     def analyse(self, input_text):
         """
         词法分析，LexicalParser类的唯一公共方法，返回一个LexicalElement列表
         
         :param input_text_: 输入文本
         """
-        # 重置解析器状态
-        self._input_text = input_text or "" # 输入文本
-        self._current_pos = 0 # 当前位置
-        self._current_row = 1 # 当前行号
-        self._current_col = 1 # 当前列号
-        self._current_char = self._input_text[0] if self._input_text else None # 当前字符
+        input_text = input_text or ""
+        self.strings = StringPool()
+        self.diagnostics = []
+        index = LineIndex(input_text)
+        # 缓存命中时直接还原词法元素，标识符和字符串按出现顺序放入字符串池
+        if self.cache is not None and (elements := self.cache.load(input_text, index)) is not None:
+            for element in elements:
+                if element.type is LexicalType.IDENTIFIER or element.type is LexicalType.STRING:
+                    self._intern(element)
+            self._log_parsing_result(elements, input_text.split('\n'))
+            return elements
         # 词法分析
-        elements = []
-        while True:
-            elements.append(self._get_next_element())
-            if elements[-1].type == LexicalType.EOF: # 如果是文件结束符，结束循环
-                break
-        self._log_parsing_result(elements)
+        if self.recover:
+            elements = list(self._iter_recovering(input_text, index))
+        elif self.engine == 'regex':
+            elements = list(self._iter_regex((input_text,), index))
+        elif self.engine == 'dfa':
+            elements = list(self._iter_dfa(input_text, index))
+        else:
+            self._reset(input_text, index) # 重置解析器状态
+            elements = self._scan_chars()
+        if self.cache is not None and not self.diagnostics: # 有词法错误的结果不缓存
+            self.cache.store(input_text, elements)
+        self._log_parsing_result(elements, input_text.split('\n'))
         return elements
 
 if __name__ == '__main__':
@@ -0,0 +1,252 @@
+"""
+词法分析器性能测试
+生成指定大小和语句构成的类Rust源代码，用各个词法分析引擎分析，报告每秒词法元素数、每秒MB数和内存峰值；
+profile模式用cProfile统计逐字符引擎各_process_*方法的耗时；batch模式比较批量分析多个文件时不同进程数的吞吐量
+
+用法：python compiler_lexer_bench.py [--size 1M] [--mix let=3,if=1,...] [--engines char,regex] [--repeat 3] [--profile]
+                                    [--batch-workers 1,2,4 --batch-files 8]
+"""
+import argparse
+import cProfile
+import gc
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.append(os.getcwd())
+from compiler_lexer import TokenBuffer, Tokenize
+from compiler_lexer_batch import lex_files
+from compiler_logger import logger
+
+# 语句模板，{id}/{num}/{float}/{str}/{op}/{cmp}由随机内容填充
+_TEMPLATES = {
+    'let': ["let {id} = {num};", "let mut {id}: i32 = {id} {op} {num};", "let {id} = ({num}, {float});"],
+    'assign': ["{id} = {id} {op} {id};", "{id} += {num};", "{id}[{num}] = {id} {op} ({id} {op} {num});"],
+    'if': ["if {id} {cmp} {num} {{ {id} = {id} {op} {num}; }} else {{ {id} = {num}; }}"],
+    'while': ["while {id} {cmp} {id} {{ {id} = {id} {op} {num}; }}", "for {id} in {num}..{num} {{ {id} = {id} {op} {id}; }}"],
+    'call': ["{id} = {id}({id});", "return {id}({num}) {op} {id};"],
+    'string': ['let {id} = {str};'],
+    'comment': ["// {id} {id} {num}", "/* {id} {op} {id}\n   {id} */"],
+}
+_DEFAULT_MIX = {'let': 3, 'assign': 3, 'if': 1, 'while': 1, 'call': 1, 'string': 1, 'comment': 1}
+_OPERATORS = ['+', '-', '*', '/', '%', '<<', '>>', '&', '|', '^']
+_COMPARISONS = ['<', '>', '<=', '>=', '==', '!=']
+
+def generate_source(size, mix=None, seed=0):
+    """
+    生成类Rust源代码
+
+    :param size: 目标大小（字符数）
+    :param mix: 语句类型 -> 权重，类型见_TEMPLATES，默认为_DEFAULT_MIX
+    :param seed: 随机种子，相同参数生成相同的源代码
+    """
+    rng = random.Random(seed)
+    mix = mix or _DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    identifiers = [f"{rng.choice('abcdefghxyz')}{rng.choice(['', '_', 'val', 'count'])}{i}" for i in range(64)]
+    generators = {
+        'id': lambda: rng.choice(identifiers),
+        'num': lambda: str(rng.randint(0, 1000)),
+        'float': lambda: f"{rng.randint(0, 100)}.{rng.randint(0, 99)}",
+        'str': lambda: f'"{rng.choice(identifiers)} \\n {rng.randint(0, 9)}"',
+        'op': lambda: rng.choice(_OPERATORS),
+        'cmp': lambda: rng.choice(_COMPARISONS),
+    }
+
+    class Fill(dict):
+        """format_map的映射：每个占位符各自生成随机内容"""
+        def __missing__(self, name):
+            return generators[name]()
+
+    fill = Fill()
+    chunks = []
+    length = 0
+    function = 0
+    while length < size:
+        lines = [f"fn f{function}(mut {fill['id']}: i32) -> i32 {{"]
+        for _ in range(rng.randint(5, 30)):
+            lines.append("    " + rng.choice(_TEMPLATES[rng.choices(kinds, weights)[0]]).format_map(fill))
+        lines.append("}\n")
+        chunk = '\n'.join(lines)
+        chunks.append(chunk)
+        length += len(chunk) + 1
+        function += 1
+    return '\n'.join(chunks)
+
+def _runners(engines, directory):
+    """
+    引擎名 -> 分析函数；除Tokenize的各引擎外，buffer为analyse_buffer，bytes为analyse_bytes，file为analyse_file（内存映射）
+    bytes和file按源代码缓存UTF-8编码和写入的文件，计时和内存峰值不含编码和写文件
+
+    :param directory: file引擎写入源文件的目录
+    """
+    encoded = {'source': None}
+
+    def encode(source):
+        if encoded['source'] is not source:
+            encoded.update(source=source, data=source.encode('utf-8'), path=None)
+        return encoded['data']
+
+    def write(source):
+        data = encode(source)
+        if encoded['path'] is None:
+            encoded['path'] = os.path.join(directory, 'source.rs')
+            with open(encoded['path'], 'wb') as file:
+                file.write(data)
+        return encoded['path']
+
+    runners = {}
+    for engine in engines:
+        if engine == 'buffer':
+            runners[engine] = Tokenize('regex').analyse_buffer
+        elif engine == 'bytes':
+            tokenize = Tokenize('regex')
+            runners[engine] = lambda source, tokenize=tokenize: tokenize.analyse_bytes(encode(source))
+        elif engine == 'file':
+            tokenize = Tokenize('regex')
+            runners[engine] = lambda source, tokenize=tokenize: tokenize.analyse_file(write(source))
+        else:
+            runners[engine] = Tokenize(engine).analyse
+    return runners
+
+def benchmark(source, engines=('char', 'regex', 'dfa', 'buffer', 'bytes', 'file'), repeat=3):
+    """
+    测量各引擎的吞吐量和内存峰值，测量期间关闭INFO日志
+
+    :param source: 源代码
+    :param engines: 引擎名列表
+    :param repeat: 计时重复次数，取最快一次
+    :return: [{engine, tokens, seconds, tokens_per_sec, mb_per_sec, peak_mb}]
+    """
+    megabytes = len(source.encode('utf-8')) / (1 << 20)
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for engine, run in _runners(engines, directory).items():
+                run(source) # 预热（如生成DFA）
+                best = float('inf')
+                for _ in range(repeat):
+                    gc.collect()
+                    start = time.perf_counter()
+                    tokens = run(source)
+                    best = min(best, time.perf_counter() - start)
+                    count = len(tokens)
+                    del tokens
+                gc.collect()
+                tracemalloc.start()
+                tokens = run(source)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del tokens
+                results.append({'engine': engine, 'tokens': count, 'seconds': best, 'tokens_per_sec': count / best,
+                                'mb_per_sec': megabytes / best, 'peak_mb': peak / (1 << 20)})
+    finally:
+        logger.setLevel(level)
+    return results
+
+def benchmark_batch(source, files=8, workers=(1, 2, 4), repeat=3):
+    """
+    把源代码写成多个文件，用lex_files按不同进程数批量分析，测量吞吐量和相对单进程的加速比；
+    分析出错的文件（lex_files返回异常）不计入元素数，单独报告
+
+    :param source: 每个文件的源代码
+    :param files: 文件数
+    :param workers: 进程数列表，1为在当前进程中依次分析
+    :param repeat: 计时重复次数，取最快一次
+    :return: [{workers, tokens, failed, seconds, tokens_per_sec, speedup}]
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(files):
+            path = os.path.join(directory, f"{i}.rs")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(source)
+            paths.append(path)
+        for count in workers:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                lexed = lex_files(paths, max_workers=count)
+                best = min(best, time.perf_counter() - start)
+            tokens = sum(len(result) for _, result in lexed if isinstance(result, TokenBuffer))
+            failed = sum(not isinstance(result, TokenBuffer) for _, result in lexed)
+            results.append({'workers': count, 'tokens': tokens, 'failed': failed, 'seconds': best, 'tokens_per_sec': tokens / best,
+                            'speedup': results[0]['seconds'] / best if results else 1.0})
+    return results
+
+def profile(source, engine='char', limit=20):
+    """
+    用cProfile分析一次词法分析，返回按累计耗时排序的报告，只列出Tokenize的方法
+
+    :param source: 源代码
+    :param engine: 引擎名
+    :param limit: 报告行数
+    """
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    profiler = cProfile.Profile()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            profiler.runcall(_runners([engine], directory)[engine], source)
+    finally:
+        logger.setLevel(level)
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(r'compiler_lexer.*\((_process_|_ignore_|_get_next_element|_move_next|_peek_next|_element|_intern|_iter_)', limit)
+    return output.getvalue()
+
+def _parse_size(text):
+    """解析大小，如4096、512K、2M"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def _parse_mix(text):
+    """解析语句构成，如let=3,if=1"""
+    mix = {}
+    for item in text.split(','):
+        kind, weight = item.split('=')
+        if kind not in _TEMPLATES:
+            raise ValueError(f"Unknown statement kind: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="词法分析器性能测试")
+    parser.add_argument('--size', default='1M', help="生成的源代码大小，如512K、2M")
+    parser.add_argument('--mix', help=f"语句构成权重，如let=3,if=1，可选类型：{','.join(_TEMPLATES)}")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--engines', default='char,regex,dfa,buffer,bytes,file', help="参与测试的引擎")
+    parser.add_argument('--repeat', type=int, default=3, help="计时重复次数")
+    parser.add_argument('--profile', action='store_true', help="用cProfile统计各方法耗时")
+    parser.add_argument('--profile-engine', default='char', help="profile模式使用的引擎")
+    parser.add_argument('--batch-workers', help="batch模式：比较的进程数，如1,2,4")
+    parser.add_argument('--batch-files', type=int, default=8, help="batch模式：文件数，每个文件为--size大小的源代码")
+    args = parser.parse_args()
+
+    source = generate_source(_parse_size(args.size), _parse_mix(args.mix) if args.mix else None, args.seed)
+    print(f"源代码：{len(source)}字符，{source.count(chr(10)) + 1}行")
+    if args.profile:
+        print(profile(source, args.profile_engine))
+    elif args.batch_workers:
+        print(f"{args.batch_files}个文件，CPU核数：{os.cpu_count()}")
+        print(f"{'进程数':<8}{'元素数':>10}{'出错文件':>10}{'耗时(s)':>10}{'元素/秒':>14}{'加速比':>10}")
+        for result in benchmark_batch(source, args.batch_files, [int(count) for count in args.batch_workers.split(',')], args.repeat):
+            print(f"{result['workers']:<8}{result['tokens']:>10}{result['failed']:>10}{result['seconds']:>10.3f}{result['tokens_per_sec']:>14.0f}"
+                  f"{result['speedup']:>10.2f}")
+    else:
+        print(f"{'引擎':<8}{'元素数':>10}{'耗时(s)':>10}{'元素/秒':>14}{'MB/秒':>10}{'内存峰值(MB)':>14}")
+        for result in benchmark(source, args.engines.split(','), args.repeat):
+            print(f"{result['engine']:<8}{result['tokens']:>10}{result['seconds']:>10.3f}{result['tokens_per_sec']:>14.0f}"
+                  f"{result['mb_per_sec']:>10.2f}{result['peak_mb']:>14.1f}")
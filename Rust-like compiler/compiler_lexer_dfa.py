@@ -0,0 +1,355 @@
+"""
+DFA词法分析器生成器
+由LexicalType构建词法规则的NFA，经子集构造和最小化得到DFA转移表，按LexicalType的哈希缓存到磁盘
+扫描时按表逐字符转移并记录最近的接受状态，一次得到最长匹配，不再逐个试探三/二/一字符运算符
+
+输入字符按ASCII逐个区分，非ASCII字符统一视为一个输入符号：字符串和注释中的非ASCII字符直接接受；
+非ASCII字符可能影响词法元素本身时（如Unicode标识符、空白、数字），该元素交由组合正则引擎分析
+
+输入内容：LexicalType
+输出内容：DFA转移表、(类型, 值, 起始偏移, 结束偏移)
+"""
+import hashlib
+import os
+import pickle
+import re
+import string
+import sys
+sys.path.append(os.getcwd())
+from array import array
+from compiler_lexer import LexicalType, lexical_type_signature, _KEYWORD_MAPPINGS, _SYMBOL_MAPPINGS, _line_end, _unescape
+from compiler_logger import logger
+
+DFA_VERSION = 1 # 生成算法版本，修改规则或表格式时递增，使旧缓存失效
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.build') # 缓存目录
+
+_OTHER = 128 # 非ASCII字符对应的输入符号
+_ALPHABET = range(_OTHER + 1)
+
+def _chars(text):
+    """字符串中各字符对应的输入符号集合"""
+    return frozenset(map(ord, text))
+
+_ANY = frozenset(_ALPHABET)
+_DIGITS = _chars(string.digits)
+_IDENTIFIER_START = _chars(string.ascii_letters + '_')
+_IDENTIFIER_PART = _IDENTIFIER_START | _DIGITS
+_WHITESPACE = _chars('\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ') # ASCII空白（与str.isspace一致）
+
+class _NFA:
+    """Thompson构造的NFA，片段表示为(入口状态, 出口状态)"""
+    def __init__(self):
+        self.edges = []   # 状态 -> [(输入符号集合, 目标状态)]
+        self.epsilon = [] # 状态 -> [目标状态]
+        self.accepts = {} # 接受状态 -> 规则序号（越小优先级越高）
+
+    def state(self):
+        self.edges.append([])
+        self.epsilon.append([])
+        return len(self.edges) - 1
+
+    def chars(self, symbols):
+        start, end = self.state(), self.state()
+        self.edges[start].append((symbols, end))
+        return start, end
+
+    def literal(self, text):
+        return self.concat(*(self.chars(_chars(ch)) for ch in text))
+
+    def concat(self, *fragments):
+        for (_, end), (start, _) in zip(fragments, fragments[1:]):
+            self.epsilon[end].append(start)
+        return fragments[0][0], fragments[-1][1]
+
+    def alternate(self, *fragments):
+        start, end = self.state(), self.state()
+        for fragment_start, fragment_end in fragments:
+            self.epsilon[start].append(fragment_start)
+            self.epsilon[fragment_end].append(end)
+        return start, end
+
+    def star(self, fragment):
+        start, end = self.state(), self.state()
+        self.epsilon[start] += [fragment[0], end]
+        self.epsilon[fragment[1]] += [fragment[0], end]
+        return start, end
+
+    def plus(self, fragment):
+        start, end = self.state(), self.state()
+        self.epsilon[start].append(fragment[0])
+        self.epsilon[fragment[1]] += [fragment[0], end]
+        return start, end
+
+    def optional(self, fragment):
+        start, end = self.state(), self.state()
+        self.epsilon[start] += [fragment[0], end]
+        self.epsilon[fragment[1]].append(end)
+        return start, end
+
+def _rules(nfa):
+    """
+    词法规则，按优先级从高到低排列，与组合正则引擎的各分支一致；同一长度的匹配取优先级高者
+
+    :return: [(标记, NFA片段)]，标记为LexicalType成员名或组合正则中的分组名
+    """
+    rules = [(ele.name, nfa.literal(ele.value)) for ele in _KEYWORD_MAPPINGS.values()]
+    rules += [(ele.name, nfa.literal(symbol)) for symbol, ele in _SYMBOL_MAPPINGS.items()]
+    not_star = nfa.chars(_ANY - _chars('*'))
+    stars = lambda: nfa.plus(nfa.chars(_chars('*')))
+    string_body = lambda: nfa.star(nfa.alternate(nfa.chars(_ANY - _chars('"\\')), nfa.concat(nfa.chars(_chars('\\')), nfa.chars(_ANY))))
+    rules += [
+        ('WHITESPACE', nfa.plus(nfa.chars(_WHITESPACE))),
+        ('LINE_COMMENT', nfa.concat(nfa.literal('//'), nfa.star(nfa.chars(_ANY - _chars('\n'))))),
+        # /\*([^*]|\*+[^*/])*\*+/ ，即在第一个*/处结束
+        ('BLOCK_COMMENT', nfa.concat(nfa.literal('/*'),
+                                     nfa.star(nfa.alternate(not_star, nfa.concat(stars(), nfa.chars(_ANY - _chars('*/'))))),
+                                     stars(), nfa.literal('/'))),
+        ('UNTERMINATED_COMMENT', nfa.literal('/*')), # 多行注释无法匹配时才会选中，即直到文件结束都没有闭合
+        ('NUMBER', nfa.concat(nfa.plus(nfa.chars(_DIGITS)),
+                              nfa.optional(nfa.concat(nfa.literal('.'), nfa.plus(nfa.chars(_DIGITS)))))),
+        ('STRING', nfa.concat(nfa.literal('"'), string_body(), nfa.literal('"'))),
+        ('UNTERMINATED_STRING', nfa.literal('"')),
+        ('IDENTIFIER', nfa.concat(nfa.chars(_IDENTIFIER_START), nfa.star(nfa.chars(_IDENTIFIER_PART)))),
+    ]
+    return rules
+
+def _closure(nfa, states):
+    """epsilon闭包"""
+    result = set(states)
+    stack = list(states)
+    while stack:
+        for target in nfa.epsilon[stack.pop()]:
+            if target not in result:
+                result.add(target)
+                stack.append(target)
+    return frozenset(result)
+
+def _build_tables():
+    """
+    构建最小化DFA
+
+    :return: (各状态的转移表[状态][输入符号] -> 目标状态或-1, 各状态的接受标记或None, 标记列表)
+    """
+    nfa = _NFA()
+    start = nfa.state()
+    tags = []
+    for priority, (tag, (fragment_start, fragment_end)) in enumerate(_rules(nfa)):
+        nfa.epsilon[start].append(fragment_start)
+        nfa.accepts[fragment_end] = priority
+        tags.append(tag)
+
+    # 子集构造
+    initial = _closure(nfa, [start])
+    subsets = {initial: 0}
+    queue = [initial]
+    delta = []
+    accepts = []
+    while len(delta) < len(queue):
+        subset = queue[len(delta)]
+        priorities = [nfa.accepts[state] for state in subset if state in nfa.accepts]
+        accepts.append(min(priorities) if priorities else None)
+        moves = {}
+        for state in subset:
+            for symbols, target in nfa.edges[state]:
+                for symbol in symbols:
+                    moves.setdefault(symbol, set()).add(target)
+        row = [-1] * len(_ALPHABET)
+        for symbol, targets in moves.items():
+            target = _closure(nfa, targets)
+            if target not in subsets:
+                subsets[target] = len(queue)
+                queue.append(target)
+            row[symbol] = subsets[target]
+        delta.append(row)
+
+    # Moore算法最小化：按接受标记初始划分，按各输入符号的目标分组反复细分
+    block_of = [accepts[state] for state in range(len(delta))]
+    while True:
+        signatures = {}
+        refined = [signatures.setdefault((block_of[state], tuple(block_of[target] if target >= 0 else -1 for target in row)), len(signatures))
+                   for state, row in enumerate(delta)]
+        if len(signatures) == len(set(block_of)):
+            break
+        block_of = refined
+    # 重新编号，保证起始状态为0
+    numbering = {}
+    for block in refined:
+        numbering.setdefault(block, len(numbering))
+    minimal_delta = [None] * len(numbering)
+    minimal_accepts = [None] * len(numbering)
+    for state, row in enumerate(delta):
+        block = numbering[refined[state]]
+        if minimal_delta[block] is None:
+            minimal_delta[block] = [numbering[refined[target]] if target >= 0 else -1 for target in row]
+            minimal_accepts[block] = accepts[state]
+    return minimal_delta, minimal_accepts, tags
+
+def lexical_type_hash():
+    """LexicalType（含别名）与生成算法版本的哈希，作为缓存键"""
+    return hashlib.sha256(repr((DFA_VERSION, lexical_type_signature())).encode('utf-8')).hexdigest()[:16]
+
+class LexerDFA:
+    """最小化DFA转移表：输入符号先映射为等价类，转移表按行展开为array"""
+    def __init__(self, delta, accepts, tags):
+        """
+        :param delta: 转移表[状态][输入符号] -> 目标状态，-1表示无转移
+        :param accepts: 各状态的接受规则序号，None表示非接受状态
+        :param tags: 规则序号 -> 标记
+        """
+        # 转移列完全相同的输入符号合并为一个等价类
+        columns = {}
+        self.symbol_classes = array('B', (columns.setdefault(tuple(row[symbol] for row in delta), len(columns)) for symbol in _ALPHABET))
+        self.class_count = len(columns)
+        self.transitions = array('i', [-1] * (len(delta) * self.class_count))
+        for state, row in enumerate(delta):
+            for symbol, target in enumerate(row):
+                self.transitions[state * self.class_count + self.symbol_classes[symbol]] = target
+        self.accepts = [tags[accept] if accept is not None else None for accept in accepts]
+        self._prepare()
+
+    @property
+    def state_count(self):
+        return len(self.accepts)
+
+    def _prepare(self):
+        """展开为扫描用的结构：每个状态一个ASCII字符 -> 目标状态的字典，外加非ASCII字符的目标"""
+        count = self.class_count
+        self._rows = []
+        self._others = []
+        for state in range(self.state_count):
+            row = self.transitions[state * count:(state + 1) * count]
+            self._rows.append({chr(symbol): row[self.symbol_classes[symbol]] for symbol in range(_OTHER)
+                               if row[self.symbol_classes[symbol]] >= 0})
+            self._others.append(row[self.symbol_classes[_OTHER]])
+        # 接受标记 -> 词法类型（关键字、运算符、界符、标识符和字符串），其余保留组合正则中的分组名
+        self._kinds = [LexicalType[tag] if tag in LexicalType.__members__ else tag for tag in self.accepts]
+
+    def __getstate__(self):
+        return {'symbol_classes': self.symbol_classes, 'class_count': self.class_count,
+                'transitions': self.transitions, 'accepts': self.accepts}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._prepare()
+
+    @classmethod
+    def build(cls):
+        """由LexicalType生成最小化DFA"""
+        return cls(*_build_tables())
+
+    def iter_spans(self, tokenize, text, index, pos=0):
+        """
+        扫描源代码，逐个产出(类型, 值, 起始偏移, 结束偏移)，结果与组合正则引擎一致
+
+        :param tokenize: 报告错误和处理非ASCII元素的Tokenize
+        :param text: 源代码
+        :param index: 源代码的LineIndex
+        :param pos: 开始位置（须位于词法元素边界）
+        """
+        tokenize._line_index = index
+        rows, others, kinds = self._rows, self._others, self._kinds
+        size = len(text)
+        while pos < size:
+            # 最长匹配：沿转移表前进，记录最近的接受状态
+            state = 0
+            kind = None
+            end = cur = pos
+            while cur < size:
+                char = text[cur]
+                target = rows[state].get(char)
+                if target is None:
+                    if char < '\x80':
+                        break
+                    target = others[state]
+                    if target < 0:
+                        break
+                state = target
+                cur += 1
+                if kinds[state] is not None:
+                    kind, end = kinds[state], cur
+            if kind is None:
+                if text[pos] < '\x80':
+                    tokenize._error(f"Unknown character: {text[pos]}", pos)
+                kind = 'FALLBACK' # 非ASCII字符开头（Unicode空白、标识符等）
+            elif kind == 'WHITESPACE' or kind == 'LINE_COMMENT' or kind == 'BLOCK_COMMENT':
+                pos = end
+                continue
+            elif kind == 'UNTERMINATED_COMMENT':
+                tokenize._error("Unterminated multi-line comment", size, pos)
+            elif kind == 'UNTERMINATED_STRING':
+                tokenize._unterminated_string(pos, _line_end(text, pos), size)
+            elif kind is LexicalType.STRING:
+                body = text[pos + 1:end - 1]
+                yield LexicalType.STRING, _unescape(body) if '\\' in body else body, pos, end
+                pos = end
+                continue
+            elif kind == 'NUMBER':
+                following = text[end:end + 2]
+                if following[:1] >= '\x80' or (following[:1] == '.' and following[1:] >= '\x80'):
+                    kind = 'FALLBACK' # 可能紧跟Unicode数字字符
+                else: # 最长匹配即为完整的数字（如1.5.2为1.5、.和2，与逐字符引擎一致）
+                    number = text[pos:end]
+                    yield (LexicalType.FLOAT, float(number), pos, end) if '.' in number else (LexicalType.INTEGER, int(number), pos, end)
+                    pos = end
+                    continue
+            elif kind is LexicalType.IDENTIFIER or kind.is_keyword:
+                if text[end:end + 1] >= '\x80': # 标识符可能以Unicode字符继续
+                    kind = 'FALLBACK'
+                else:
+                    yield kind, text[pos:end], pos, end
+                    pos = end
+                    continue
+            else: # 运算符和界符
+                yield kind, text[pos:end], pos, end
+                pos = end
+                continue
+            # 与非ASCII字符相关的词法元素交由组合正则引擎分析一个元素
+            span = next(tokenize._iter_spans((text,), index, 0, pos))
+            if span[0] is LexicalType.EOF:
+                break
+            yield span
+            pos = span[3]
+        yield LexicalType.EOF, None, size, size
+
+_LEXER_DFA = None # 进程内缓存
+
+def _remove_stale_caches(cache_dir, keep):
+    """删除缓存目录中由旧版本LexicalType或生成算法得到的DFA缓存，保留keep"""
+    for file_name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, file_name)
+        if re.fullmatch(r'lexer_dfa_[0-9a-f]{16}\.pickle', file_name) and path != keep:
+            try:
+                os.remove(path)
+            except OSError: # 可能已被并发的进程删除
+                pass
+
+def load_lexer_dfa(cache_dir=CACHE_DIR):
+    """
+    获取LexicalType对应的DFA：优先使用进程内缓存，其次读取磁盘缓存，都没有时重新生成并写入磁盘
+
+    :param cache_dir: 缓存目录，None表示不使用磁盘缓存
+    """
+    global _LEXER_DFA
+    if _LEXER_DFA is not None:
+        return _LEXER_DFA
+    path = os.path.join(cache_dir, f"lexer_dfa_{lexical_type_hash()}.pickle") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, 'rb') as file:
+                _LEXER_DFA = pickle.load(file)
+            return _LEXER_DFA
+        except Exception as e: # 缓存损坏时重新生成
+            logger.warning(f"读取DFA缓存失败，将重新生成: {e}")
+    _LEXER_DFA = LexerDFA.build()
+    logger.info(f"已生成词法DFA：{_LEXER_DFA.state_count}个状态，{_LEXER_DFA.class_count}个输入等价类")
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                pickle.dump(_LEXER_DFA, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path) # 原子替换，避免并发写入产生不完整的缓存
+            _remove_stale_caches(cache_dir, path)
+        except OSError as e:
+            logger.warning(f"写入DFA缓存失败: {e}")
+    return _LEXER_DFA
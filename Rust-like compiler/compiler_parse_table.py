@@ -0,0 +1,198 @@
+"""
+压缩的LR分析表
+文法符号编号为整数，动作编码为整数，各状态的行按行位移（row displacement）方法压入共享的一维数组：
+ACTION表每个状态取出现最多的规约作为默认规约，GOTO表每个非终结符取出现最多的目标状态作为默认转移，与默认值相同的项不再存储；
+每个状态另存有效终结符的位掩码，使用默认规约时出错位置和期望的终结符仍与原表完全相同
+
+动作编码：正数n为移入并转到状态n-1，负数-n为用产生式n-1规约，0为接受
+
+输入内容：ACTION表、GOTO表、产生式表
+输出内容：ParseTable
+"""
+import os
+import sys
+sys.path.append(os.getcwd())
+from array import array
+from collections import Counter
+from compiler_logger import logger
+
+ACCEPT = 0
+NO_DEFAULT = 0x7FFFFFFF # 没有默认规约/默认转移
+
+def encode_action(action):
+    """('shift', n)、('reduce', n)、('accept',)转为整数编码"""
+    if action[0] == 'shift':
+        return action[1] + 1
+    if action[0] == 'reduce':
+        return -action[1] - 1
+    if action[0] == 'accept':
+        return ACCEPT
+    raise ValueError(f"Unknown action: {action}")
+
+def decode_action(code):
+    """整数编码转为('shift', n)、('reduce', n)、('accept',)"""
+    if code > 0:
+        return ('shift', code - 1)
+    if code < 0:
+        return ('reduce', -code - 1)
+    return ('accept',)
+
+def _displace(rows, width):
+    """
+    行位移压缩：按非空项从多到少为每行选择最小的基址，使各行的非空项落在不同的槽中
+
+    :param rows: 各行的{列号: 值}
+    :param width: 列数
+    :return: (base, check, value)，行r列c的值在value[base[r] + c]，当且仅当check[base[r] + c] == r时存在
+    """
+    base = [0] * len(rows)
+    check = []
+    value = []
+    occupied = 0 # 已占用槽的位掩码
+    first_free = 0 # 此前的槽都已占用
+    for r in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        row = rows[r]
+        if not row:
+            continue
+        cols = sorted(row)
+        pattern = 0
+        for col in cols:
+            pattern |= 1 << col
+        b = max(0, first_free - cols[0])
+        while occupied >> b & pattern:
+            b += 1
+        occupied |= pattern << b
+        end = b + cols[-1] + 1
+        if end > len(check):
+            check.extend([-1] * (end - len(check)))
+            value.extend([0] * (end - len(value)))
+        for col, val in row.items():
+            check[b + col] = r
+            value[b + col] = val
+        base[r] = b
+        while occupied >> first_free & 1:
+            first_free += 1
+    # 补齐到任意基址加任意列号都不越界
+    padding = max(base, default=0) + width - len(check)
+    if padding > 0:
+        check.extend([-1] * padding)
+        value.extend([0] * padding)
+    return array('i', base), array('i', check), array('i', value)
+
+class ParseTable:
+    """压缩的ACTION/GOTO表"""
+    def __init__(self, terminals, non_terminals, valid, action_tables, goto_tables, prod_lhs, prod_len, relabels=None):
+        """
+        :param terminals: 终结符列表，下标为编号
+        :param non_terminals: 非终结符列表，下标为编号
+        :param valid: 各状态有效终结符的位掩码
+        :param action_tables: ACTION表的(base, check, value, default)
+        :param goto_tables: GOTO表的(base, check, value, default)，default按非终结符编号
+        :param prod_lhs: 各产生式左部的非终结符编号
+        :param prod_len: 各产生式右部的长度
+        :param relabels: 跳过单一产生式规约的表，规约时需要改写子节点符号的位置：产生式编号 -> ((位置, 符号), ...)
+        """
+        self.terminals = terminals
+        self.non_terminals = non_terminals
+        self.terminal_ids = {t: i for i, t in enumerate(terminals)}
+        self.non_terminal_ids = {nt: i for i, nt in enumerate(non_terminals)}
+        self.valid = valid
+        self.action_base, self.action_check, self.action_value, self.action_default = action_tables
+        self.goto_base, self.goto_check, self.goto_value, self.goto_default = goto_tables
+        self.prod_lhs = prod_lhs
+        self.prod_len = prod_len
+        self.relabels = relabels or {}
+
+    @classmethod
+    def compile(cls, action, goto_tbl, rule_index_map, relabels=None):
+        """
+        由SyntaxParser的分析表生成压缩表
+
+        :param action: 状态 -> {终结符: 动作}
+        :param goto_tbl: 状态 -> {非终结符: 状态}
+        :param rule_index_map: 产生式编号 -> {'lhs', 'rhs'}
+        :param relabels: 见__init__
+        """
+        terminals = sorted({sym for row in action.values() for sym in row})
+        non_terminals = sorted({prod['lhs'] for prod in rule_index_map.values()} | {sym for row in goto_tbl.values() for sym in row})
+        terminal_ids = {t: i for i, t in enumerate(terminals)}
+        non_terminal_ids = {nt: i for i, nt in enumerate(non_terminals)}
+        state_count = 1 + max([*action, *goto_tbl], default=0)
+
+        valid = [0] * state_count
+        action_default = array('i', [NO_DEFAULT]) * state_count
+        action_rows = []
+        for state in range(state_count):
+            row = {terminal_ids[sym]: encode_action(act) for sym, act in action.get(state, {}).items()}
+            for col in row:
+                valid[state] |= 1 << col
+            reduces = Counter(code for code in row.values() if code < 0)
+            if reduces:
+                # 出现最多的规约作为默认规约，次数相同时取编号最小的产生式
+                default = max(reduces, key=lambda code: (reduces[code], code))
+                action_default[state] = default
+                row = {col: code for col, code in row.items() if code != default}
+            action_rows.append(row)
+
+        goto_rows = [{non_terminal_ids[sym]: target for sym, target in goto_tbl.get(state, {}).items()}
+                     for state in range(state_count)]
+        goto_default = array('i', [NO_DEFAULT]) * len(non_terminals)
+        for nt in range(len(non_terminals)):
+            targets = Counter(row[nt] for row in goto_rows if nt in row)
+            if targets:
+                goto_default[nt] = max(targets, key=lambda target: (targets[target], -target))
+        goto_rows = [{nt: target for nt, target in row.items() if target != goto_default[nt]} for row in goto_rows]
+
+        prod_count = 1 + max(rule_index_map, default=-1)
+        prod_lhs = array('i', [0]) * prod_count
+        prod_len = array('i', [0]) * prod_count
+        for idx, prod in rule_index_map.items():
+            prod_lhs[idx] = non_terminal_ids[prod['lhs']]
+            prod_len[idx] = len(prod['rhs'])
+
+        table = cls(terminals, non_terminals, valid, (*_displace(action_rows, len(terminals)), action_default),
+                    (*_displace(goto_rows, len(non_terminals)), goto_default), prod_lhs, prod_len, relabels)
+        entries = sum(len(row) for row in action.values()) + sum(len(row) for row in goto_tbl.values())
+        logger.info(f"压缩分析表：{state_count}个状态，{entries}项 -> ACTION {len(table.action_value)}个槽、"
+                    f"GOTO {len(table.goto_value)}个槽")
+        return table
+
+    def action(self, state, terminal):
+        """
+        查询ACTION表
+
+        :param state: 状态
+        :param terminal: 终结符编号
+        :return: 动作编码，出错时为None
+        """
+        if not self.valid[state] >> terminal & 1:
+            return None
+        i = self.action_base[state] + terminal
+        if self.action_check[i] == state:
+            return self.action_value[i]
+        return self.action_default[state]
+
+    def goto(self, state, non_terminal):
+        """
+        查询GOTO表
+
+        :param state: 状态
+        :param non_terminal: 非终结符编号
+        :return: 目标状态，没有转移时为None
+        """
+        i = self.goto_base[state] + non_terminal
+        if self.goto_check[i] == state:
+            return self.goto_value[i]
+        target = self.goto_default[non_terminal]
+        return None if target == NO_DEFAULT else target
+
+    def expected(self, state):
+        """状态下有效的终结符，按名称排序"""
+        mask = self.valid[state]
+        return sorted(t for i, t in enumerate(self.terminals) if mask >> i & 1)
+
+    def nbytes(self):
+        """压缩表数组占用的字节数"""
+        arrays = (self.action_base, self.action_check, self.action_value, self.action_default,
+                  self.goto_base, self.goto_check, self.goto_value, self.goto_default, self.prod_lhs, self.prod_len)
+        return sum(len(a) * a.itemsize for a in arrays) + sum((mask.bit_length() + 7) // 8 for mask in self.valid)
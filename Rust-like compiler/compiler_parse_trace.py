@@ -0,0 +1,111 @@
+"""
+语法分析过程记录
+每一步只记录增量：动作类型（移入或规约）、移入后或GOTO后的状态、移入的Token或规约使用的产生式、弹出的符号数，
+以及压入的符号下方是哪一步压入的符号：每一步恰好压入一个符号，第k步执行前的栈顶即第k-1步压入的符号，
+沿链接即可还原任一步的状态栈和节点栈；每隔CHECKPOINT_INTERVAL步记录一次已移入的Token数，用于还原剩余输入串，
+记录占用的内存与步数成正比
+
+输入内容：语法分析的每一步动作
+输出内容：与原先每步完整快照相同格式的步骤：{"stack", "node_stack", "input", "action", "production"}
+"""
+from array import array
+
+SHIFT, REDUCE = range(2)
+
+class ParseTrace:
+    """按步骤记录的语法分析过程，支持len()、下标访问和遍历"""
+    CHECKPOINT_INTERVAL = 64 # 每隔多少步记录一次已移入的Token数
+
+    def __init__(self, rule_index_map):
+        """
+        :param rule_index_map: 产生式编号 -> {'lhs', 'rhs'}
+        """
+        self.rule_index_map = rule_index_map
+        self.kinds = array('b')   # 动作类型
+        self.states = array('i')  # 移入后的状态或规约GOTO后的状态
+        self.args = array('i')    # 移入的Token下标或规约使用的产生式
+        self.popped = array('i')  # 规约弹出的符号数
+        self.below = array('i')   # 压入的符号下方的符号由第几步压入，-1为栈底
+        self.tokens = []          # 依次读入的Token
+        self._shifted = 0         # 已移入的Token数
+        self._checkpoints = array('i') # 第i个为第i*CHECKPOINT_INTERVAL步执行前已移入的Token数
+
+    def read(self, token):
+        """记录读入的下一个Token"""
+        self.tokens.append(token)
+
+    def shift(self, state):
+        """记录移入，state为移入后的状态"""
+        self._append(SHIFT, state, self._shifted, 0, len(self) - 1)
+        self._shifted += 1
+
+    def reduce(self, prod_idx, popped, state):
+        """记录规约，state为GOTO后的状态"""
+        self._append(REDUCE, state, prod_idx, popped, self._pop(len(self) - 1, popped))
+
+    def _append(self, kind, state, arg, popped, below):
+        if len(self) % self.CHECKPOINT_INTERVAL == 0:
+            self._checkpoints.append(self._shifted)
+        self.kinds.append(kind)
+        self.states.append(state)
+        self.args.append(arg)
+        self.popped.append(popped)
+        self.below.append(below)
+
+    def _pop(self, top, count):
+        """栈顶为top时弹出count个符号后的栈顶"""
+        below = self.below
+        for _ in range(count):
+            top = below[top]
+        return top
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+        checkpoint = index // self.CHECKPOINT_INTERVAL
+        idx = self._checkpoints[checkpoint]
+        for step in range(checkpoint * self.CHECKPOINT_INTERVAL, index):
+            idx += self.kinds[step] == SHIFT
+        return self._view(index, idx)
+
+    def __iter__(self):
+        idx = 0
+        for step in range(len(self)):
+            yield self._view(step, idx)
+            idx += self.kinds[step] == SHIFT
+
+    def _node(self, step):
+        """第step步压入的语法树节点的字符串形式"""
+        if self.kinds[step] == SHIFT:
+            token = self.tokens[self.args[step]]
+            return f"{token.type.value}({token.value})"
+        return f"{self.rule_index_map[self.args[step]]['lhs']}[{self.popped[step]}]"
+
+    def _view(self, step, idx):
+        """第step步执行前的完整快照，idx为此时已移入的Token数"""
+        origins = []
+        top = step - 1
+        while top >= 0:
+            origins.append(top)
+            top = self.below[top]
+        origins.reverse()
+        production = ""
+        if self.kinds[step] == SHIFT:
+            action = f"移入: {self.tokens[idx]} -> 状态{self.states[step]}"
+        else:
+            prod_idx = self.args[step]
+            prod = self.rule_index_map[prod_idx]
+            production = f"{prod['lhs']} → {' '.join(prod['rhs']) if prod['rhs'] else 'ε'}"
+            action = f"规约: 使用产生式 {prod_idx}"
+        return {
+            "stack": [0, *(self.states[origin] for origin in origins)],
+            "node_stack": [self._node(origin) for origin in origins],
+            "input": [str(t) for t in self.tokens[idx:]],
+            "action": action,
+            "production": production
+        }
@@ -1,5 +1,13 @@
 """Rust-like语法分析器"""
-from collections import namedtuple, defaultdict
+import gc
+import hashlib
+import os
+import pickle
+import re
+from collections import namedtuple, defaultdict, deque
+from compiler_lexer import Tokenize
+from compiler_parse_table import ParseTable, NO_DEFAULT
+from compiler_parse_trace import ParseTrace
 from compiler_parser_node import ParseNode
 from compiler_rust_grammar import RUST_GRAMMAR, TEST_GRAMMAR, LEFT_RECURSION_GRAMMAR
 from compiler_semantic_checker import SemanticChecker
@@ -9,24 +17,67 @@ from enum import Enum
 # 定义LR(1)项目
 LR1Item = namedtuple('LR1Item', ['lhs', 'rhs', 'dot', 'lookahead'])
 
+PARSE_TABLE_VERSION = 5 # 分析表构建算法和缓存格式版本，修改时递增，使旧缓存失效
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.build') # 分析表缓存目录
+
+def _canonical(value):
+    """把文法中的集合换为排序后的列表，使repr与集合的迭代顺序（随进程的字符串哈希种子变化）无关"""
+    if isinstance(value, (set, frozenset)):
+        return sorted(map(_canonical, value), key=repr)
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(map(_canonical, value))
+    return value
+
+def grammar_hash(grammar):
+    """文法与分析表版本的哈希，作为分析表缓存键"""
+    return hashlib.sha256(repr((PARSE_TABLE_VERSION, _canonical(grammar))).encode('utf-8')).hexdigest()[:16]
+
+def _remove_stale_caches(cache_dir, prefix, keep):
+    """删除缓存目录中以prefix开头、其后只有文法哈希的旧缓存文件，保留keep"""
+    for file_name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, file_name)
+        if file_name.startswith(prefix) and re.fullmatch(r'[0-9a-f]{16}\.pickle', file_name[len(prefix):]) and path != keep:
+            try:
+                os.remove(path)
+            except OSError: # 可能已被并发的进程删除
+                pass
+
+class Conflict(namedtuple('Conflict', ['state', 'symbol', 'previous', 'chosen'])):
+    """分析表冲突：状态state遇到symbol时，动作previous被chosen覆盖"""
+    def key(self):
+        """与状态编号无关的冲突标识，用于比较不同构造方法的冲突"""
+        return self.symbol, frozenset(action if action[0] != 'shift' else ('shift',) for action in (self.previous, self.chosen))
+
 class SyntaxParser:
+    MODES = {'lr1': 'LR(1)', 'lalr': 'LALR(1)', 'pager': '最小LR(1)'}
+    CLOSURE_CACHE_SIZE = 4096 # 闭包缓存的最大项数
+
     def __init__(self):
-        self._first_cache = {}
+        self._closure_cache = {}
+        self.new_conflicts = None # lalr/pager模式下合并同心状态新引入的归约-归约冲突，见_report_new_conflicts
 
     def _setup_grammar(self):
-        """初始化文法"""
+        """初始化文法，计算FIRST集并输出文法信息"""
+        self._index_grammar()
+        self._compute_first()
+        self._print_grammar()
+
+    def _index_grammar(self):
+        """按左部整理产生式，记录终结符、非终结符和起始符号；从缓存读取分析表时只需这一步"""
         self.terminals = set(self.grammar.get('terminals', []))
         self.non_terminals = set(self.grammar.get('non_terminals', []))
         self.rules = defaultdict(list)
         self.rule_index_map = {}
         self.start = self.grammar['start_symbol']
+        self._closure_cache = {}
         for idx, prod in enumerate(self.grammar['productions']):
             left = prod['prod_lhs']
             right = prod['prod_rhs']
             self.non_terminals.add(left)
             self.rules[left].append({'rhs': right, 'idx': idx})
             self.rule_index_map[idx] = {'lhs': left, 'rhs': right}
-        self._print_grammar()
 
     def remove_left_recursion(self, grammar):
         """消除左递归"""
@@ -68,10 +119,13 @@ class SyntaxParser:
         return grammar
 
     def closure(self, items):
-        """LR(1)闭包"""
-        closure_set = set()
-        for itm in items:
-            closure_set.add(self._dict_to_item(itm) if isinstance(itm, dict) else itm)
+        """LR(1)闭包，按核心项目集合缓存"""
+        kernel = frozenset(self._dict_to_item(itm) if isinstance(itm, dict) else itm for itm in items)
+        return self._cached_closure(('lr1', kernel), lambda: self._closure_items(kernel))
+
+    def _closure_items(self, kernel):
+        """求LR1Item集合的闭包"""
+        closure_set = set(kernel)
         changed = True
         while changed:
             changed = False
@@ -108,153 +162,719 @@ class SyntaxParser:
                 ))
         return self.closure(next_set) if next_set else None
 
-    def first(self, symbols, visited=None):
-        """计算FIRST集"""
-        if visited is None:
-            visited = set()
-        key = tuple(symbols)
-        if key in self._first_cache:
-            return self._first_cache[key].copy()
-        if key in visited:
-            return set()
-        visited.add(key)
-        result = set()
-        if not symbols:
+    def first(self, symbols):
+        """计算符号串的FIRST集，能推出空串时包含''"""
+        bits, nullable = self._first_of(symbols)
+        result = {t for i, t in enumerate(self._terminal_list) if bits >> i & 1}
+        if nullable:
             result.add('')
-            return result
+        return result
+
+    def _first_of(self, symbols):
+        """符号串的FIRST集位掩码及能否推出空串，由各符号预先计算的结果折叠得到"""
+        bits = 0
         for sym in symbols:
-            if sym in self.terminals or sym == '$':
-                result.add(sym)
-                result.discard('')
-                break
-            elif sym in self.non_terminals:
-                epsilon = False
-                for prod in self.rules.get(sym, []):
-                    if not prod['rhs']:
-                        result.add('')
-                        epsilon = True
-                        continue
-                    sub_first = self.first(prod['rhs'], visited.copy())
-                    result.update(sub_first - {''})
-                    if '' in sub_first:
-                        epsilon = True
-                if not epsilon:
-                    result.discard('')
-                    break
-            else:
+            sym_bits = self._first_bits.get(sym)
+            if sym_bits is None:
                 raise ValueError(f"未知符号: {sym}")
-        self._first_cache[key] = result
-        return result
+            bits |= sym_bits
+            if sym not in self._nullable:
+                return bits, False
+        return bits, True
 
-    def build_table(self, grammar):
-        """构建LR(1)分析表"""
-        self.grammar = grammar
+    def _compute_first(self):
+        """
+        以不动点迭代预先计算各文法符号的FIRST集位掩码和nullable：终结符（含'$'）各占一位，
+        非终结符的结果变化时，只重新计算右部含有它的非终结符
+        """
+        self._terminal_list = sorted(self.terminals | {'$'})
+        self._terminal_bits = {t: 1 << i for i, t in enumerate(self._terminal_list)}
+        first = dict(self._terminal_bits)
+        nullable = set()
+        users = defaultdict(set) # 符号 -> 右部含有该符号的非终结符
+        for lhs in self.non_terminals:
+            first[lhs] = 0
+            for prod in self.rules[lhs]:
+                for sym in prod['rhs']:
+                    users[sym].add(lhs)
+        work = deque(self.non_terminals)
+        queued = set(work)
+        while work:
+            lhs = work.popleft()
+            queued.discard(lhs)
+            bits = first[lhs]
+            is_nullable = lhs in nullable
+            for prod in self.rules[lhs]:
+                for sym in prod['rhs']:
+                    bits |= first.get(sym, 0) # 未知符号在求FIRST时才报错
+                    if sym not in nullable:
+                        break
+                else:
+                    is_nullable = True
+            if bits != first[lhs] or is_nullable != (lhs in nullable):
+                first[lhs] = bits
+                if is_nullable:
+                    nullable.add(lhs)
+                for user in users[lhs]:
+                    if user not in queued:
+                        work.append(user)
+                        queued.add(user)
+        self._first_bits = first
+        self._nullable = nullable
+
+    def build_table(self, grammar, mode='lr1', baseline=None, bypass=False):
+        """
+        构建LR分析表，冲突按先移入、后按项目顺序依次规约的方式覆盖，记录在self.conflicts中
+
+        :param grammar: 文法
+        :param mode: 'lr1'为规范LR(1)；'lalr'为LALR(1)，在LR(0)项目集族上计算自发生成和传播的向前看符号；
+                     'pager'为最小LR(1)，按Pager弱相容条件合并同心状态，状态数接近LALR(1)且不引入新冲突
+        :param baseline: 规范LR(1)分析表的冲突列表，lalr/pager模式下据此报告合并同心状态新引入的归约-归约冲突；
+                         未提供时按合并到各状态的原核心判断，见_merged_reduce_conflicts
+        :param bypass: 在表中跳过文法里标记了'bypass'的单一产生式的规约，默认关闭：以状态数和表的大小换取更少的规约，
+                       见_bypass_unit_reductions
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown table mode: {mode}")
+        self._set_grammar(grammar, mode, bypass)
+        self.new_conflicts = None
         self._setup_grammar()
-        logger.debug("开始构建LR(1)分析表")
+        logger.debug(f"开始构建{self.MODES[mode]}分析表")
         self.action = defaultdict(dict)
         self.goto_tbl = defaultdict(dict)
+        self.conflicts = []
         self.states = []
-        start_prod = self.rules[self.start][0]
-        init_item = LR1Item(
-            lhs=self.start,
-            rhs=tuple(start_prod['rhs']),
-            dot=0,
-            lookahead='$'
-        )
-        init_state = self.closure([init_item])
-        self.states = [init_state]
-        queue = [init_state]
-        state_map = {init_state: 0}
-        self._print_state(0, init_state)
+        builders = {'lr1': self._build_lr1_states, 'lalr': self._build_lalr_states, 'pager': self._build_pager_states}
+        transitions = builders[mode]()
+        for sid, state in enumerate(self.states):
+            self._fill_state(sid, state, transitions[sid])
+        relabels = self._bypass_unit_reductions() if bypass else None
+        logger.debug(f"分析表构建完成，共{len(self.states)}个状态，{len(self.conflicts)}个冲突")
+        self.table = ParseTable.compile(self.action, self.goto_tbl, self.rule_index_map, relabels)
+        if mode != 'lr1':
+            self._report_new_conflicts(self.MODES[mode], baseline, transitions)
+        return self.action, self.goto_tbl
+
+    def _set_grammar(self, grammar, mode, bypass):
+        """记录构建分析表的参数"""
+        self.grammar = grammar
+        self.mode = mode
+        self.bypass = bypass
+
+    def _build_lr1_states(self):
+        """
+        构建规范LR(1)项目集族，返回各状态的转移：状态号 -> {文法符号: 目标状态号}
+        内部以整数表示项目、以位掩码表示向前看符号集合，状态以核心项目为键，只对新状态求闭包；
+        kernel_map即闭包的备忘录：每个核心只求一次闭包，再次出现时直接得到状态号，因此不经过容量受限的_closure_cache
+        """
+        self._setup_items()
+        item_next = self._item_next
+        init_kernel = {self._prod_items[self.start][0]: self._terminal_bits['$']}
+        closures = [self._closure_bits(init_kernel)]
+        kernel_map = {frozenset(init_kernel.items()): 0}
+        transitions = [{}]
+        queue = deque([0])
         while queue:
-            state = queue.pop(0)
-            sid = state_map[state]
+            sid = queue.popleft()
             logger.debug(f"处理状态{sid}")
-            for sym in self.terminals | self.non_terminals:
-                next_state = self.goto(state, sym)
-                if next_state and len(next_state) > 0:
-                    if next_state not in state_map:
-                        new_id = len(self.states)
-                        state_map[next_state] = new_id
-                        self.states.append(next_state)
-                        queue.append(next_state)
-                        self._print_state(new_id, next_state)
-                    new_id = state_map[next_state]
-                    if sym in self.terminals:
-                        self.action[sid][sym] = ('shift', new_id)
-                    else:
-                        self.goto_tbl[sid][sym] = new_id
-            for item in state:
-                if item.dot == len(item.rhs):
-                    if item.lhs == self.start and item.lookahead == '$':
-                        self.action[sid]['$'] = ('accept',)
+            targets = defaultdict(dict) # 一次遍历按点后符号分组，得到各转移目标的核心
+            for item, las in closures[sid].items():
+                sym = item_next[item]
+                if sym is not None:
+                    targets[sym][item + 1] = las
+            for sym, kernel in targets.items():
+                key = frozenset(kernel.items())
+                new_id = kernel_map.get(key)
+                if new_id is None:
+                    new_id = kernel_map[key] = len(closures)
+                    closures.append(self._closure_bits(kernel))
+                    transitions.append({})
+                    queue.append(new_id)
+                transitions[sid][sym] = new_id
+        for sid, closure in enumerate(closures):
+            state = self._decode_state(closure)
+            self.states.append(state)
+            self._print_state(sid, state)
+        return transitions
+
+    def _setup_items(self):
+        """
+        把LR(1)项目编码为整数：产生式的各个点位置连续编号，项目编号加一即为点右移后的项目；
+        向前看符号集合使用与FIRST集相同的终结符位掩码
+        """
+        self._item_rule = []     # 项目 -> (lhs, rhs, dot)
+        self._item_next = []     # 项目 -> 点后的符号，规约项目为None
+        self._item_first = []    # 项目 -> 点后符号之后的串beta的FIRST集位掩码
+        self._item_nullable = [] # 项目 -> beta能否推出空串
+        self._prod_items = defaultdict(list) # 非终结符 -> 其各产生式点在最左的项目
+        seen = set()
+        for idx in sorted(self.rule_index_map):
+            lhs, rhs = self.rule_index_map[idx]['lhs'], tuple(self.rule_index_map[idx]['rhs'])
+            if (lhs, rhs) in seen: # 重复的产生式对应同一组项目
+                continue
+            seen.add((lhs, rhs))
+            self._prod_items[lhs].append(len(self._item_rule))
+            for dot in range(len(rhs) + 1):
+                first, nullable = self._first_of(rhs[dot+1:])
+                self._item_rule.append((lhs, rhs, dot))
+                self._item_next.append(rhs[dot] if dot < len(rhs) else None)
+                self._item_first.append(first)
+                self._item_nullable.append(nullable)
+        self._item_expand = [self._prod_items.get(sym) if sym in self.non_terminals else None for sym in self._item_next]
+
+    def _closure_bits(self, kernel):
+        """
+        整数项目的LR(1)闭包
+
+        :param kernel: 核心项目 -> 向前看符号位掩码
+        :return: 闭包项目 -> 向前看符号位掩码
+        """
+        expand, first, nullable = self._item_expand, self._item_first, self._item_nullable
+        items = dict(kernel)
+        work = list(items)
+        while work:
+            item = work.pop()
+            targets = expand[item]
+            if targets:
+                las = first[item] | items[item] if nullable[item] else first[item]
+                for new_item in targets:
+                    current = items.get(new_item)
+                    if current is None:
+                        items[new_item] = las
+                        work.append(new_item)
+                    elif las & ~current:
+                        items[new_item] = current | las
+                        work.append(new_item)
+        return items
+
+    def _decode_state(self, closure):
+        """整数项目集转为按(lhs, rhs, dot, lookahead)排序的LR1Item元组"""
+        terminals = self._terminal_list
+        return tuple(sorted((LR1Item(*self._item_rule[item], terminals[i])
+                             for item, las in closure.items() for i in range(las.bit_length()) if las >> i & 1),
+                            key=lambda x: (x.lhs, x.rhs, x.dot, x.lookahead)))
+
+    def _build_lalr_states(self):
+        """
+        构建LALR(1)项目集族：先构建LR(0)项目集族，再对每个核心项目以'#'为向前看符号求闭包，
+        确定自发生成的向前看符号和传播关系，迭代传播至不动点
+        """
+        start_item = (self.start, tuple(self.rules[self.start][0]['rhs']), 0)
+        kernels = [frozenset([start_item])]
+        kernel_map = {kernels[0]: 0}
+        transitions = []
+        for kernel in kernels: # 构建LR(0)项目集族，kernels在遍历中增长
+            targets = defaultdict(set)
+            for lhs, rhs, dot in self._closure_sets({item: set() for item in kernel}):
+                if dot < len(rhs):
+                    targets[rhs[dot]].add((lhs, rhs, dot + 1))
+            row = {}
+            for sym, target in targets.items():
+                target = frozenset(target)
+                if target not in kernel_map:
+                    kernel_map[target] = len(kernels)
+                    kernels.append(target)
+                row[sym] = kernel_map[target]
+            transitions.append(row)
+        lookaheads = {(sid, item): set() for sid, kernel in enumerate(kernels) for item in kernel}
+        lookaheads[(0, start_item)].add('$')
+        propagation = defaultdict(list)
+        for sid, kernel in enumerate(kernels):
+            for item in kernel:
+                for (lhs, rhs, dot), las in self._closure_sets({item: {'#'}}).items():
+                    if dot < len(rhs):
+                        target = (transitions[sid][rhs[dot]], (lhs, rhs, dot + 1))
+                        for la in las:
+                            if la == '#':
+                                propagation[(sid, item)].append(target)
+                            else:
+                                lookaheads[target].add(la)
+        changed = True
+        while changed:
+            changed = False
+            for source, targets in propagation.items():
+                las = lookaheads[source]
+                for target in targets:
+                    if not las <= lookaheads[target]:
+                        lookaheads[target] |= las
+                        changed = True
+        for sid, kernel in enumerate(kernels):
+            closure = self._closure_sets({item: lookaheads[(sid, item)] for item in kernel})
+            state = tuple(sorted((LR1Item(lhs, rhs, dot, la) for (lhs, rhs, dot), las in closure.items() for la in las),
+                                 key=lambda x: (x.lhs, x.rhs, x.dot, x.lookahead)))
+            self.states.append(state)
+            self._print_state(sid, state)
+        return transitions
+
+    def _build_pager_states(self):
+        """
+        构建最小LR(1)项目集族：按规范LR(1)方式生成状态，新状态与已有同心状态弱相容时合并向前看符号，
+        合并使向前看符号增加的状态重新计算其后继；最后删除因重新计算而不可达的状态
+        """
+        start_item = (self.start, tuple(self.rules[self.start][0]['rhs']), 0)
+        kernels = [{start_item: {'$'}}]
+        transitions = [{}]
+        core_map = defaultdict(list) # 核心 -> 同心状态号列表
+        core_map[frozenset(kernels[0])].append(0)
+        queue = deque([0])
+        queued = {0}
+        while queue:
+            sid = queue.popleft()
+            queued.discard(sid)
+            targets = defaultdict(dict)
+            for (lhs, rhs, dot), las in self._closure_sets(kernels[sid]).items():
+                if dot < len(rhs):
+                    targets[rhs[dot]].setdefault((lhs, rhs, dot + 1), set()).update(las)
+            row = {}
+            for sym, kernel in targets.items():
+                candidates = core_map[frozenset(kernel)]
+                target = next((t for t in candidates if kernels[t] == kernel), None)
+                if target is None:
+                    target = next((t for t in candidates if self._weakly_compatible(kernels[t], kernel)), None)
+                    if target is None:
+                        target = len(kernels)
+                        kernels.append(kernel)
+                        transitions.append({})
+                        candidates.append(target)
+                        changed = True
                     else:
-                        for prod in self.rules[item.lhs]:
-                            if tuple(prod['rhs']) == item.rhs:
-                                self.action[sid][item.lookahead] = ('reduce', prod['idx'])
-                                break
-        logger.debug(f"分析表构建完成，共{len(self.states)}个状态")
+                        changed = False
+                        for item, las in kernel.items():
+                            if not las <= kernels[target][item]:
+                                kernels[target][item] |= las
+                                changed = True
+                    if changed and target not in queued:
+                        queue.append(target)
+                        queued.add(target)
+                row[sym] = target
+            transitions[sid] = row
+        order = {0: 0} # 从初始状态按广度优先重新编号，丢弃不可达状态
+        reachable = [0]
+        for sid in reachable:
+            for target in transitions[sid].values():
+                if target not in order:
+                    order[target] = len(reachable)
+                    reachable.append(target)
+        for new_id, sid in enumerate(reachable):
+            closure = self._closure_sets(kernels[sid])
+            state = tuple(sorted((LR1Item(lhs, rhs, dot, la) for (lhs, rhs, dot), las in closure.items() for la in las),
+                                 key=lambda x: (x.lhs, x.rhs, x.dot, x.lookahead)))
+            self.states.append(state)
+            self._print_state(new_id, state)
+        return [{sym: order[target] for sym, target in transitions[sid].items()} for sid in reachable]
+
+    @staticmethod
+    def _weakly_compatible(kernel1, kernel2):
+        """
+        Pager弱相容：同心的两个核心中任意两个项目i、j，若合并后i、j的向前看符号相交，
+        则在某一个状态中它们本来就相交，即合并不会引入新的归约-归约冲突
+        """
+        items = list(kernel1)
+        for i, x in enumerate(items):
+            for y in items[i+1:]:
+                if (kernel1[x] & kernel2[y] or kernel1[y] & kernel2[x]) and not (kernel1[x] & kernel1[y] or kernel2[x] & kernel2[y]):
+                    return False
+        return True
+
+    def _closure_sets(self, kernel):
+        """
+        以向前看符号集合表示的闭包，按核心缓存
+
+        :param kernel: 核心项目(lhs, rhs, dot) -> 向前看符号集合
+        :return: 闭包项目(lhs, rhs, dot) -> 向前看符号集合
+        """
+        key = ('sets', frozenset((item, frozenset(las)) for item, las in kernel.items()))
+        return self._cached_closure(key, lambda: self._closure_sets_uncached(kernel))
+
+    def _closure_sets_uncached(self, kernel):
+        """求以向前看符号集合表示的闭包"""
+        items = {item: set(las) for item, las in kernel.items()}
+        work = list(items)
+        while work:
+            item = work.pop()
+            lhs, rhs, dot = item
+            if dot < len(rhs) and rhs[dot] in self.non_terminals:
+                beta = rhs[dot+1:]
+                first = self.first(beta) if beta else {''}
+                las = first - {''}
+                if '' in first:
+                    las |= items[item]
+                for prod in self.rules[rhs[dot]]:
+                    new_item = (rhs[dot], tuple(prod['rhs']), 0)
+                    if new_item not in items:
+                        items[new_item] = set(las)
+                        work.append(new_item)
+                    elif not las <= items[new_item]:
+                        items[new_item] |= las
+                        work.append(new_item)
+        return items
+
+    def _cached_closure(self, key, compute):
+        """
+        按核心缓存闭包，缓存项数超过CLOSURE_CACHE_SIZE时淘汰最早加入的一项；缓存的闭包不可修改
+        用于closure/goto和LALR(1)、最小LR(1)的构造，规范LR(1)的构造按核心去重，见_build_lr1_states
+
+        :param key: 闭包类型和规范化的核心
+        :param compute: 未命中时计算闭包的函数
+        """
+        cache = self._closure_cache
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            if len(cache) >= self.CLOSURE_CACHE_SIZE:
+                del cache[next(iter(cache))]
+            cache[key] = result
+        return result
+
+    def _fill_state(self, sid, state, transitions):
+        """根据状态的转移和规约项目填写ACTION/GOTO表"""
+        for sym, new_id in transitions.items():
+            if sym in self.terminals:
+                self.action[sid][sym] = ('shift', new_id)
+            else:
+                self.goto_tbl[sid][sym] = new_id
+        for item in state:
+            if item.dot == len(item.rhs):
+                if item.lhs == self.start and item.lookahead == '$':
+                    self._set_action(sid, '$', ('accept',))
+                else:
+                    for prod in self.rules[item.lhs]:
+                        if tuple(prod['rhs']) == item.rhs:
+                            self._set_action(sid, item.lookahead, ('reduce', prod['idx']))
+                            break
+
+    def _set_action(self, sid, sym, action):
+        """写入ACTION表，覆盖已有的不同动作时记录冲突"""
+        previous = self.action[sid].get(sym)
+        if previous is not None and previous != action:
+            self.conflicts.append(Conflict(sid, sym, previous, action))
+        self.action[sid][sym] = action
+
+    def _bypass_productions(self):
+        """文法中标记了'bypass'的单一产生式编号，检查右部只有一个符号且这些产生式不构成环"""
+        bypass = set()
+        chains = defaultdict(set) # X -> {A | A → X}
+        for idx, prod in self.rule_index_map.items():
+            if self.grammar['productions'][idx].get('bypass'):
+                if len(prod['rhs']) != 1:
+                    raise ValueError(f"Bypass production must have exactly one symbol: {prod['lhs']} → {' '.join(prod['rhs'])}")
+                bypass.add(idx)
+                chains[prod['rhs'][0]].add(prod['lhs'])
+        done, visiting = set(), set()
+        def visit(symbol):
+            if symbol in visiting:
+                raise ValueError(f"Bypass productions form a cycle through {symbol}")
+            if symbol not in done:
+                visiting.add(symbol)
+                for lhs in chains[symbol]:
+                    visit(lhs)
+                visiting.discard(symbol)
+                done.add(symbol)
+        for symbol in list(chains):
+            visit(symbol)
+        return bypass
+
+    def _bypass_unit_reductions(self):
+        """
+        在ACTION/GOTO表中跳过单一产生式A → X的规约（文法中标记为'bypass'，语义动作只复制子节点的属性）：
+        状态u经X转到的状态t对向前看符号集合L按A → X规约时，u经X改为转到合并状态，
+        合并状态在L上的动作取u经A转到的状态（同样经过跳过），其余动作和GOTO取t，两者的GOTO冲突时不跳过；
+        分析时X的节点直接占据A的位置，由上层产生式规约时把节点的符号改为产生式右部对应位置的符号
+
+        不同的u经A转到不同的状态时t拆分为多个合并状态，因此这是以表的大小换分析速度（RUST_GRAMMAR_PPT实测）：
+        状态数规范LR(1) 757 → 1110、LALR(1)/Pager 209 → 303，压缩分析表约增大一倍；
+        分析时的规约和语义回调约减少一半，语法树节点减少约三分之一，分析用时减少约三到四成；
+        只跳过不拆分状态的t时状态数不变，但规约只减少1%～6%，分析用时没有可测的改善，所以不作限制，由调用方选择
+
+        :return: 规约时需要改写子节点符号的位置：产生式编号 -> ((位置, 符号), ...)
+        """
+        bypass = self._bypass_productions()
+        rules = self.rule_index_map
+        state_count = len(self.states)
+        raw_action = [self.action.get(sid, {}) for sid in range(state_count)]
+        raw_goto = [self.goto_tbl.get(sid, {}) for sid in range(state_count)]
+        targets = {} # (状态, 符号) -> 跳过后的目标状态
+        merged = {}  # (t, u经A转到的状态) -> 合并状态
+
+        def target(u, symbol):
+            """状态u经symbol转到的状态，跳过其中的单一产生式规约"""
+            key = (u, symbol)
+            if key in targets:
+                return targets[key]
+            t = raw_goto[u].get(symbol)
+            if t is None:
+                action = raw_action[u].get(symbol)
+                t = action[1] if action and action[0] == 'shift' else None
+            result = t
+            if t is not None:
+                units = defaultdict(set)
+                for sym, action in raw_action[t].items():
+                    if action[0] == 'reduce' and action[1] in bypass:
+                        units[action[1]].add(sym)
+                if len(units) == 1:
+                    (prod_idx, lookaheads), = units.items()
+                    parent = target(u, rules[prod_idx]['lhs'])
+                    if parent is not None:
+                        result = merge(t, prod_idx, lookaheads, parent)
+            targets[key] = result
+            return result
+
+        def merge(t, prod_idx, lookaheads, parent):
+            """t中按prod_idx规约的动作换为parent的动作"""
+            key = (t, parent)
+            if key in merged:
+                return merged[key]
+            action = {sym: act for sym, act in raw_action[t].items() if sym not in lookaheads}
+            for sym in lookaheads:
+                if sym in raw_action[parent]:
+                    action[sym] = raw_action[parent][sym]
+            goto = dict(raw_goto[t])
+            for sym, state in raw_goto[parent].items():
+                if goto.setdefault(sym, state) != state:
+                    merged[key] = t
+                    return t
+            prod = rules[prod_idx]
+            unit = (prod['lhs'], tuple(prod['rhs']), 1)
+            items = [item for item in self.states[t] if (item.lhs, item.rhs, item.dot) != unit] + list(self.states[parent])
+            merged[key] = len(raw_action)
+            raw_action.append(action)
+            raw_goto.append(goto)
+            self.states.append(tuple(sorted(items, key=lambda x: (x.lhs, x.rhs, x.dot, x.lookahead))))
+            return merged[key]
+
+        self.action = defaultdict(dict)
+        self.goto_tbl = defaultdict(dict)
+        sid = 0
+        while sid < len(raw_action): # 处理过程中会追加合并状态
+            for sym, action in raw_action[sid].items():
+                self.action[sid][sym] = ('shift', target(sid, sym)) if action[0] == 'shift' else action
+            for sym in raw_goto[sid]:
+                self.goto_tbl[sid][sym] = target(sid, sym)
+            sid += 1
+        logger.debug(f"跳过单一产生式规约：{len(bypass)}个产生式，新增{len(raw_action) - state_count}个合并状态")
+        bypass_lhs = {rules[idx]['lhs'] for idx in bypass}
+        relabels = {idx: tuple((i, sym) for i, sym in enumerate(prod['rhs']) if sym in bypass_lhs) for idx, prod in rules.items()}
+        return {idx: relabel for idx, relabel in relabels.items() if relabel}
+
+    def _report_new_conflicts(self, name, baseline, transitions=None):
+        """
+        报告合并同心状态新引入的归约-归约冲突：提供baseline时与规范LR(1)的冲突比较，
+        否则由状态转移判断（见_merged_reduce_conflicts）；两者都没有（从缓存读取）时沿用缓存中的结果
+        """
+        reduce_conflicts = [c for c in self.conflicts if c.previous[0] == 'reduce' and c.chosen[0] == 'reduce']
+        if baseline is not None:
+            known = {c.key() for c in baseline}
+            self.new_conflicts = [c for c in reduce_conflicts if c.key() not in known]
+        elif transitions is not None:
+            self.new_conflicts = self._merged_reduce_conflicts(reduce_conflicts, transitions)
+        for c in self.new_conflicts:
+            logger.warning(f"{name}新引入归约-归约冲突：状态{c.state}遇到{c.symbol}，"
+                           f"产生式{c.previous[1]}与{c.chosen[1]}，选择{c.chosen[1]}")
+        logger.info(f"{name}分析表共{len(reduce_conflicts)}个归约-归约冲突，其中{len(self.new_conflicts)}个为新引入")
+
+    def _merged_reduce_conflicts(self, conflicts, transitions):
+        """
+        不依赖规范LR(1)分析表，找出合并同心状态新引入的归约-归约冲突：
+        沿合并后的状态转移按规范LR(1)方式从初始核心展开，得到合并到每个状态的各个原核心，
+        冲突的两个产生式在某个原核心的闭包中都以该符号为向前看符号时，冲突在合并前已存在
+
+        :param conflicts: 归约-归约冲突
+        :param transitions: 合并后各状态的转移
+        :return: 新引入的冲突
+        """
+        by_state = defaultdict(list)
+        for c in conflicts:
+            by_state[c.state].append(c)
+        if not by_state:
+            return []
+        def reduce_item(action):
+            prod = self.rule_index_map[action[1]]
+            return prod['lhs'], tuple(prod['rhs']), len(prod['rhs'])
+        start_item = (self.start, tuple(self.rules[self.start][0]['rhs']), 0)
+        work = [(0, {start_item: {'$'}})]
+        seen = {(0, frozenset({(start_item, frozenset({'$'}))}))}
+        inherited = set()
+        while work:
+            sid, kernel = work.pop()
+            closure = self._closure_sets(kernel)
+            for c in by_state.get(sid, ()):
+                if c.symbol in closure.get(reduce_item(c.previous), ()) and c.symbol in closure.get(reduce_item(c.chosen), ()):
+                    inherited.add(c)
+            targets = defaultdict(dict)
+            for (lhs, rhs, dot), las in closure.items():
+                if dot < len(rhs):
+                    targets[rhs[dot]].setdefault((lhs, rhs, dot + 1), set()).update(las)
+            for sym, target_kernel in targets.items():
+                target = transitions[sid][sym]
+                key = (target, frozenset((item, frozenset(las)) for item, las in target_kernel.items()))
+                if key not in seen:
+                    seen.add(key)
+                    work.append((target, target_kernel))
+        return [c for c in conflicts if c not in inherited]
+
+    def load_table(self, grammar, cache_dir=CACHE_DIR, mode='lr1', baseline=None, bypass=False, name=None):
+        """
+        获取分析表：优先读取磁盘缓存，未命中或文法已修改时重新构建并写入磁盘，同时删除同名同参数的旧缓存；
+        从缓存读取时只整理产生式，不计算FIRST集、不输出文法信息，也不恢复项目集（self.states为空）
+
+        :param grammar: 文法
+        :param cache_dir: 缓存目录，None表示不使用磁盘缓存
+        :param mode: 分析表构造方法，见build_table
+        :param baseline: 规范LR(1)分析表的冲突列表，见build_table；从缓存读取时同样据此报告新引入的冲突
+        :param bypass: 是否跳过单一产生式的规约，见build_table
+        :param name: 缓存名，文法修改后以同一名称写入的新缓存会替换旧缓存；默认为文法的起始符号
+        """
+        if not cache_dir:
+            return self.build_table(grammar, mode, baseline, bypass)
+        self._set_grammar(grammar, mode, bypass)
+        prefix = f"parse_table_{name or grammar['start_symbol']}_{mode}{'_bypass' if bypass else ''}_"
+        path = os.path.join(cache_dir, f"{prefix}{grammar_hash(self.grammar)}.pickle")
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    cached = pickle.load(file)
+                self._index_grammar()
+                self.action = defaultdict(dict, cached['action'])
+                self.goto_tbl = defaultdict(dict, cached['goto_tbl'])
+                self.rule_index_map = cached['rule_index_map']
+                self.conflicts = cached['conflicts']
+                self.table = cached['table']
+                self.states = []
+                self.new_conflicts = cached['new_conflicts']
+                logger.info(f"已读取分析表缓存：{len(self.action)}个状态")
+                if mode != 'lr1':
+                    self._report_new_conflicts(self.MODES[mode], baseline)
+                return self.action, self.goto_tbl
+            except Exception as e: # 缓存损坏时重新构建
+                logger.warning(f"读取分析表缓存失败，将重新构建: {e}")
+        self.build_table(grammar, mode, baseline, bypass)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                pickle.dump({'action': dict(self.action), 'goto_tbl': dict(self.goto_tbl), 'rule_index_map': self.rule_index_map,
+                             'conflicts': self.conflicts, 'new_conflicts': self.new_conflicts, 'table': self.table},
+                            file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path) # 原子替换，避免并发写入产生不完整的缓存
+            _remove_stale_caches(cache_dir, prefix, path)
+        except OSError as e:
+            logger.warning(f"写入分析表缓存失败: {e}")
         return self.action, self.goto_tbl
 
-    def parse(self, tokens, checker: SemanticChecker = None):
-        """LR(1)语法分析"""
-        steps = []
+    def parse_stream(self, source, checker: SemanticChecker = None, tokenize: Tokenize = None):
+        """
+        拉取式语法分析：每次向词法分析器请求一个Token，只保留当前Token和错误上下文所需的最近两个Token，
+        不记录分析过程，并在规约后释放已完成语义检查的子树，内存占用只与分析栈深度有关而与输入长度无关
+
+        只有组合正则引擎的非恢复模式按文本块流式分析（见Tokenize.iter_tokens），其他引擎和恢复模式需要先读入完整输入，
+        内存会随输入长度增长，因此不接受
+
+        :param source: 源代码字符串、文件对象或文本块的可迭代对象
+        :param checker: 语义检查器，每次规约时回调
+        :param tokenize: 词法分析器，须为Tokenize('regex')且不使用恢复模式，默认新建一个
+        :return: 语法树根节点，只保留其直接子节点
+        """
+        tokenize = tokenize or Tokenize('regex')
+        if tokenize.engine != 'regex' or tokenize.recover:
+            raise ValueError(f"parse_stream needs the streaming regex engine without recovery, "
+                             f"got engine={tokenize.engine!r}, recover={tokenize.recover}")
+        root, _ = self.parse(tokenize.iter_tokens(source), checker, trace=False, prune=True)
+        return root
+
+    def parse(self, tokens, checker: SemanticChecker = None, trace=False, prune=False, disable_gc=False):
+        """
+        LR(1)语法分析，在压缩分析表self.table上运行
+        Token类型、动作和产生式都按整数编号处理，直接查询压缩表的数组，规约时原地截断分析栈；
+        每个Token只取一次类型编号，在内层循环中完成它之前的全部规约
+
+        :param tokens: LexicalElement序列或迭代器（如Tokenize.iter_tokens），按需逐个读取
+        :param checker: 语义检查器，每次规约时回调
+        :param trace: 是否记录分析过程；记录为每步的增量（ParseTrace），访问某一步时才还原完整的栈和剩余输入串
+        :param prune: 规约并回调语义检查后丢弃子节点的子树（语义动作只读取直接子节点），语法树只保留每个节点的直接子节点
+        :param disable_gc: 分析期间暂停循环垃圾回收，结束或出错后恢复。语法树节点大多存活到分析结束，分代回收只会反复遍历它们；
+            gc.disable()对整个进程生效（包括GUI线程），只在独占进程的批量分析中使用
+        :return: (语法树根节点, 分析过程)，不记录时分析过程为[]
+        """
+        table = self.table
+        terminal_ids, valid = table.terminal_ids, table.valid
+        base, check, value, default = table.action_base, table.action_check, table.action_value, table.action_default
+        goto_base, goto_check, goto_value, goto_default = table.goto_base, table.goto_check, table.goto_value, table.goto_default
+        prod_lhs, prod_len, relabels = table.prod_lhs, table.prod_len, table.relabels
+        lhs_symbols = [table.non_terminals[lhs] for lhs in prod_lhs] # 各产生式左部的符号
+        steps = ParseTrace(self.rule_index_map) if trace else None
         state_stack = [0]
         node_stack = []
-        idx = 0
-        token_list = list(tokens)
-        while True:
-            state = state_stack[-1]
-            cur_token = token_list[idx]
-            step = {
-                "stack": list(state_stack),
-                "node_stack": [str(n) for n in node_stack],
-                "input": [str(t) for t in token_list[idx:]],
-                "action": "",
-                "production": ""
-            }
-            action = self.action[state].get(cur_token.type.value)
-            if not action:
-                expected = sorted(self.action[state].keys())
-                context = token_list[max(0, idx-2):idx+1]
-                raise SyntaxError(
-                    f"语法错误（第{cur_token.line}行, 第{cur_token.column}列）\n"
-                    f"意外Token: {cur_token}\n"
-                    f"期望: {expected}\n"
-                    f"上下文: {context}"
-                )
-            if action[0] == 'shift':
-                step["action"] = f"移入: {cur_token} -> 状态{action[1]}"
-                node_stack.append(ParseNode(symbol=cur_token.type.value, children=None, token=cur_token))
-                idx += 1
-                state_stack.append(action[1])
-            elif action[0] == 'reduce':
-                prod_idx = action[1]
-                prod = self.rule_index_map[prod_idx]
-                lhs = prod['lhs']
-                rhs_len = len(prod['rhs'])
-                step["production"] = f"{lhs} → {' '.join(prod['rhs']) if prod['rhs'] else 'ε'}"
-                step["action"] = f"规约: 使用产生式 {prod_idx}"
-                children = []
-                if rhs_len > 0:
-                    state_stack = state_stack[:-rhs_len]
-                    children = node_stack[-rhs_len:]
-                    node_stack = node_stack[:-rhs_len]
-                new_node = ParseNode(symbol=lhs, children=children)
-                if checker:
-                    checker.on_reduce(node=new_node)
-                node_stack.append(new_node)
-                goto_state = self.goto_tbl[state_stack[-1]].get(lhs)
-                if goto_state is None:
-                    raise SyntaxError(f"无效GOTO：状态{state_stack[-1]}遇到{lhs}")
-                state_stack.append(goto_state)
-            elif action[0] == 'accept':
-                step["action"] = "接受: 分析完成"
-                break
-            else:
-                raise SyntaxError(f"无效动作: {action}")
-            steps.append(step)
-        return node_stack[0], steps
+        state = 0
+        previous = last = None # 最近移入的两个Token，用于错误上下文
+        token_iter = iter(tokens)
+        cur_token = next(token_iter, None)
+        if trace:
+            steps.read(cur_token)
+        gc_paused = disable_gc and gc.isenabled()
+        if gc_paused:
+            gc.disable()
+        try:
+            while True: # 每次读入一个Token，先完成该Token下的全部规约，再移入或接受
+                if cur_token is None:
+                    raise SyntaxError("语法错误：输入在文件结束符之前结束")
+                symbol = cur_token.type.value
+                terminal = terminal_ids.get(symbol, -1)
+                while True:
+                    if terminal < 0 or not valid[state] >> terminal & 1:
+                        expected = table.expected(state)
+                        context = [token for token in (previous, last) if token is not None] + [cur_token]
+                        raise SyntaxError(
+                            f"语法错误（第{cur_token.line}行, 第{cur_token.column}列）\n"
+                            f"意外Token: {cur_token}\n"
+                            f"期望: {expected}\n"
+                            f"上下文: {context}"
+                        )
+                    i = base[state] + terminal
+                    action = value[i] if check[i] == state else default[state]
+                    if action >= 0: # 移入或接受
+                        break
+                    prod_idx = -action - 1 # 规约
+                    rhs_len = prod_len[prod_idx]
+                    if rhs_len:
+                        children = node_stack[-rhs_len:]
+                        del node_stack[-rhs_len:]
+                        del state_stack[-rhs_len:]
+                    else:
+                        children = []
+                    if prod_idx in relabels: # 跳过单一产生式规约的节点取所在位置的符号
+                        for j, rhs_symbol in relabels[prod_idx]:
+                            children[j].symbol = rhs_symbol
+                    new_node = ParseNode(lhs_symbols[prod_idx], children)
+                    if checker:
+                        checker.on_reduce(node=new_node)
+                    if prune:
+                        for child in children:
+                            child.children = []
+                    node_stack.append(new_node)
+                    top = state_stack[-1]
+                    lhs = prod_lhs[prod_idx]
+                    i = goto_base[top] + lhs
+                    state = goto_value[i] if goto_check[i] == top else goto_default[lhs]
+                    if state == NO_DEFAULT:
+                        raise SyntaxError(f"无效GOTO：状态{top}遇到{lhs_symbols[prod_idx]}")
+                    state_stack.append(state)
+                    if trace:
+                        steps.reduce(prod_idx, rhs_len, state)
+                if not action: # 接受
+                    break
+                node_stack.append(ParseNode(symbol, None, cur_token)) # 移入
+                previous, last = last, cur_token
+                cur_token = next(token_iter, None)
+                state = action - 1
+                state_stack.append(state)
+                if trace:
+                    steps.shift(state)
+                    if cur_token is not None:
+                        steps.read(cur_token)
+        finally:
+            if gc_paused:
+                gc.enable()
+        return node_stack[0], steps if trace else []
 
     @staticmethod
     def _dict_to_item(item_dict: dict) -> LR1Item:
@@ -0,0 +1,175 @@
+"""
+语法分析器生成器
+由构建好的SyntaxParser生成独立的Python模块：压缩分析表以字面量写入模块，附带专用的分析循环，
+不依赖compiler_rust_grammar和项目集构造，导入时不再处理文法
+
+生成的模块提供parse(tokens, checker=None, prune=False)，结果、语义回调和错误信息与SyntaxParser.parse相同；
+模块内附带只含语法部分的ParseNode，不做语义检查时只依赖标准库，
+传入checker时改用compiler_parser_node.ParseNode（语义动作读写它的综合属性，检查器本身也依赖该模块）
+
+输入内容：SyntaxParser
+输出内容：Python源代码
+用法：python compiler_parser_generator.py [-o rust_parser_generated.py] [--mode lalr] [--bypass]
+"""
+import argparse
+import os
+import py_compile
+import sys
+sys.path.append(os.getcwd())
+from compiler_parse_table import NO_DEFAULT
+from compiler_parser import SyntaxParser, grammar_hash
+
+_HEADER = '''"""
+由compiler_parser_generator生成的{mode_name}语法分析器，请勿手动修改
+文法哈希：{grammar_hash}，{state_count}个状态，{prod_count}个产生式
+不做语义检查时只依赖标准库；传入checker时语法树节点改用compiler_parser_node.ParseNode
+"""
+from array import array
+from collections import deque
+
+GRAMMAR_HASH = {grammar_hash!r}
+NO_DEFAULT = {no_default}
+'''
+
+_DRIVER = '''
+TERMINAL_IDS = {t: i for i, t in enumerate(TERMINALS)}
+
+
+class ParseNode:
+    """语法树节点，与compiler_parser_node.ParseNode的语法部分相同，不含语义分析属性"""
+    def __init__(self, symbol, children=None, token=None):
+        self.symbol = symbol
+        self.children = children if children is not None else []
+        self.token = token
+        self.value = getattr(token, "value", None)
+        self.line = getattr(token, "line", -1)
+        self.column = getattr(token, "column", -1)
+
+    def is_terminal(self):
+        return self.token is not None
+
+    def __str__(self):
+        if self.token:
+            return f"{self.symbol}({self.token.value})"
+        return f"{self.symbol}[{len(self.children)}]"
+
+    def __repr__(self):
+        return f"<ParseNode {self.__str__()}>"
+
+
+def parse(tokens, checker=None, prune=False):
+    """
+    LR语法分析
+
+    :param tokens: LexicalElement序列或迭代器，按需逐个读取
+    :param checker: 语义检查器，每次规约时回调on_reduce；传入时语法树节点改用compiler_parser_node.ParseNode
+    :param prune: 规约并回调语义检查后丢弃子节点的子树
+    :return: 语法树根节点
+    """
+    node_type = ParseNode
+    if checker:
+        from compiler_parser_node import ParseNode as node_type
+    terminal_ids, valid = TERMINAL_IDS, VALID
+    base, check, value, default = ACTION_BASE, ACTION_CHECK, ACTION_VALUE, ACTION_DEFAULT
+    goto_base, goto_check, goto_value, goto_default = GOTO_BASE, GOTO_CHECK, GOTO_VALUE, GOTO_DEFAULT
+    prod_lhs, prod_len, non_terminals, relabels = PROD_LHS, PROD_LEN, NON_TERMINALS, RELABELS
+    state_stack = [0]
+    node_stack = []
+    history = deque(maxlen=2) # 最近移入的Token，用于错误上下文
+    token_iter = iter(tokens)
+    token = next(token_iter, None)
+    state = 0
+    while True:
+        if token is None:
+            raise SyntaxError("语法错误：输入在文件结束符之前结束")
+        terminal = terminal_ids.get(token.type.value, -1)
+        if terminal < 0 or not valid[state] >> terminal & 1:
+            expected = sorted(t for i, t in enumerate(TERMINALS) if valid[state] >> i & 1)
+            context = [*history, token]
+            raise SyntaxError(
+                f"语法错误（第{token.line}行, 第{token.column}列）\\n"
+                f"意外Token: {token}\\n"
+                f"期望: {expected}\\n"
+                f"上下文: {context}"
+            )
+        i = base[state] + terminal
+        code = value[i] if check[i] == state else default[state]
+        if code > 0: # 移入
+            node_stack.append(node_type(symbol=token.type.value, children=None, token=token))
+            history.append(token)
+            token = next(token_iter, None)
+            state = code - 1
+            state_stack.append(state)
+        elif code < 0: # 规约
+            prod = -code - 1
+            rhs_len = prod_len[prod]
+            lhs = prod_lhs[prod]
+            if rhs_len:
+                children = node_stack[-rhs_len:]
+                del node_stack[-rhs_len:]
+                del state_stack[-rhs_len:]
+                if prod in relabels: # 跳过单一产生式规约的节点取所在位置的符号
+                    for i, symbol in relabels[prod]:
+                        children[i].symbol = symbol
+            else:
+                children = []
+            node = node_type(symbol=non_terminals[lhs], children=children)
+            if checker:
+                checker.on_reduce(node=node)
+            if prune:
+                for child in children:
+                    child.children = []
+            node_stack.append(node)
+            top = state_stack[-1]
+            i = goto_base[top] + lhs
+            state = goto_value[i] if goto_check[i] == top else goto_default[lhs]
+            if state == NO_DEFAULT:
+                raise SyntaxError(f"无效GOTO：状态{top}遇到{non_terminals[lhs]}")
+            state_stack.append(state)
+        else: # 接受
+            return node_stack[0]
+'''
+
+def _format_sequence(name, values, wrapper=None, per_line=16):
+    """把序列格式化为多行字面量赋值语句"""
+    lines = [', '.join(repr(v) for v in values[i:i + per_line]) for i in range(0, len(values), per_line)]
+    body = ''.join(f"    {line},\n" for line in lines)
+    literal = f"[\n{body}]" if wrapper else f"(\n{body})"
+    return f"{name} = {wrapper}('i', {literal})\n" if wrapper else f"{name} = {literal}\n"
+
+def generate_parser_module(parser: SyntaxParser):
+    """
+    生成独立的语法分析器模块源代码
+
+    :param parser: 已构建或读取分析表的SyntaxParser
+    """
+    table = parser.table
+    parts = [_HEADER.format(mode_name=parser.MODES[parser.mode], grammar_hash=grammar_hash(parser.grammar),
+                            state_count=len(table.valid), prod_count=len(table.prod_len), no_default=NO_DEFAULT), '\n']
+    parts.append(_format_sequence('TERMINALS', table.terminals, per_line=10))
+    parts.append(_format_sequence('NON_TERMINALS', table.non_terminals, per_line=6))
+    parts.append(_format_sequence('VALID', table.valid, per_line=6))
+    for name in ('action_base', 'action_check', 'action_value', 'action_default',
+                 'goto_base', 'goto_check', 'goto_value', 'goto_default', 'prod_lhs', 'prod_len'):
+        parts.append(_format_sequence(name.upper(), getattr(table, name), wrapper='array'))
+    parts.append(f"RELABELS = {table.relabels!r}\n")
+    parts.append(_DRIVER)
+    return ''.join(parts)
+
+def write_parser_module(parser: SyntaxParser, path):
+    """生成独立的语法分析器模块并写入文件，同时编译字节码，导入时不再解析字面量源代码"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(generate_parser_module(parser))
+    py_compile.compile(path, doraise=True)
+
+if __name__ == '__main__':
+    from compiler_rust_grammar import RUST_GRAMMAR_PPT
+    arg_parser = argparse.ArgumentParser(description="生成独立的语法分析器模块")
+    arg_parser.add_argument('-o', '--output', default='rust_parser_generated.py', help="输出文件")
+    arg_parser.add_argument('--mode', default='lr1', choices=list(SyntaxParser.MODES), help="分析表构造方法")
+    arg_parser.add_argument('--bypass', action='store_true', help="跳过文法中标记为bypass的单一产生式的规约（分析更快，分析表约大一倍）")
+    args = arg_parser.parse_args()
+    syntax_parser = SyntaxParser()
+    syntax_parser.load_table(RUST_GRAMMAR_PPT, mode=args.mode, bypass=args.bypass)
+    write_parser_module(syntax_parser, args.output)
+    print(f"已生成{args.output}")
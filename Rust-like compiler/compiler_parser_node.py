@@ -28,6 +28,20 @@ class SynthesizedAttributes:
     break_list: List[int] = field(default_factory=list)
 
 class ParseNode:
+    # 语义分析属性，赋值前读取类属性上的默认值，创建节点时不再逐个赋值
+    expr_res: Optional[ExprResult] = None # 表达式结果信息
+    var_name: Optional[str] = None        # 变量声明用
+    type_obj: Optional[type] = None       # 变量声明用
+    is_mutable: Optional[bool] = None     # 变量声明用
+    expressions = None                    # 数组和元组用
+    member_types = None                   # 数组和元组用
+
+    # 函数/方法相关属性
+    return_type = None     # 返回值类型(函数节点)
+    last_return = False    # 判断最后一个语句是不是返回语句
+    parameters = None      # 参数列表(函数节点)
+    arguments = None       # 函数调用参数
+
     def __init__(
             self, 
             symbol: str, 
@@ -36,6 +50,7 @@ class ParseNode:
             ):
         """
         语法分析树节点
+        行列号（line, column）和综合属性（attributes）在首次访问时才计算或创建
         
         :param symbol: 节点符号(String)
         :param children: 子节点列表
@@ -47,25 +62,17 @@ class ParseNode:
 
         # 终结符相关属性
         self.value = getattr(token, "value", None)
-        self.line = getattr(token, "line", -1)
-        self.column = getattr(token, "column", -1)
-
-        # 语义分析属性
-        self.expr_res: Optional[ExprResult] = None # 表达式结果信息
-        self.var_name: Optional[str] = None        # 变量声明用
-        self.type_obj: Optional[type] = None       # 变量声明用
-        self.is_mutable: Optional[bool] = None     # 变量声明用
-        self.expressions = None                    # 数组和元组用
-        self.member_types = None                   # 数组和元组用
-
-        # 函数/方法相关属性
-        self.return_type = None     # 返回值类型(函数节点)
-        self.last_return = False    # 判断最后一个语句是不是返回语句
-        self.parameters = None      # 参数列表(函数节点)
-        self.arguments = None       # 函数调用参数
 
-        # 综合属性
-        self.attributes: Optional[SynthesizedAttributes] = SynthesizedAttributes()
+    def __getattr__(self, name):
+        # 只在实例上没有该属性时调用，计算或创建后保存在实例上
+        if name == 'line' or name == 'column':
+            position = getattr(self.token, name, -1)
+            setattr(self, name, position)
+            return position
+        if name == 'attributes':
+            self.attributes = SynthesizedAttributes() # 综合属性
+            return self.attributes
+        raise AttributeError(f"'ParseNode' object has no attribute '{name}'")
         
     def is_terminal(self):
         """判断是否为终结符节点"""
@@ -427,6 +427,8 @@ RUST_GRAMMAR_PPT = {
     'non_terminals' : {
     },
     # 每一项是一个产生式 是一推一的关系
+    # 'bypass': True 标记语义动作只复制子节点属性的单一产生式，构建分析表时可选择跳过其规约（build_table(bypass=True)，默认不跳过，
+    # 跳过后分析更快但状态数和分析表变大，见SyntaxParser._bypass_unit_reductions）
     'productions' : [
         # Program structure
         {'prod_lhs': 'Begin', 'prod_rhs': ['Program']},
@@ -528,7 +530,7 @@ RUST_GRAMMAR_PPT = {
         {'prod_lhs': 'IterableStructure', 'prod_rhs': ['Element']},
 
         # Expressions
-        {'prod_lhs': 'Expression', 'prod_rhs': ['AddExpression']},
+        {'prod_lhs': 'Expression', 'prod_rhs': ['AddExpression'], 'bypass': True},
         {'prod_lhs': 'Expression', 'prod_rhs': ['Expression', 'Relop', 'AddExpression']},
         {'prod_lhs': 'Expression', 'prod_rhs': ['FunctionExpressionBlock']},
         {'prod_lhs': 'Expression', 'prod_rhs': ['SelectExpression']},
@@ -536,13 +538,13 @@ RUST_GRAMMAR_PPT = {
 
         {'prod_lhs': 'SelectExpression', 'prod_rhs': ['if', 'Expression', 'ControlFLowMarker', 'FunctionExpressionBlock', 'else', 'FunctionExpressionBlock']},
 
-        {'prod_lhs': 'AddExpression', 'prod_rhs': ['Item']},
+        {'prod_lhs': 'AddExpression', 'prod_rhs': ['Item'], 'bypass': True},
         {'prod_lhs': 'AddExpression', 'prod_rhs': ['AddExpression', 'AddOp', 'Item']},
 
-        {'prod_lhs': 'Item', 'prod_rhs': ['Factor']},
+        {'prod_lhs': 'Item', 'prod_rhs': ['Factor'], 'bypass': True},
         {'prod_lhs': 'Item', 'prod_rhs': ['Item', 'MulOp', 'Factor']},
 
-        {'prod_lhs': 'Factor', 'prod_rhs': ['Element']},
+        {'prod_lhs': 'Factor', 'prod_rhs': ['Element'], 'bypass': True},
         {'prod_lhs': 'Factor', 'prod_rhs': ['[', 'ArrayElementList', ']']},
         {'prod_lhs': 'Factor', 'prod_rhs': ['[', ']']},
         {'prod_lhs': 'Factor', 'prod_rhs': ['(', 'TupleAssignInner', ')']},
@@ -563,7 +565,7 @@ RUST_GRAMMAR_PPT = {
         {'prod_lhs': 'TupleElementList', 'prod_rhs': ['Expression', ',', 'TupleElementList']},
 
         {'prod_lhs': 'Assignableidentifier', 'prod_rhs': ['*', 'Assignableidentifier']},
-        {'prod_lhs': 'Assignableidentifier', 'prod_rhs': ['AssignableidentifierInner']},
+        {'prod_lhs': 'Assignableidentifier', 'prod_rhs': ['AssignableidentifierInner'], 'bypass': True},
 
         {'prod_lhs': 'AssignableidentifierInner', 'prod_rhs': ['Element', '[', 'Expression', ']']},
         {'prod_lhs': 'AssignableidentifierInner', 'prod_rhs': ['Element', '.', 'NUM']},
@@ -580,18 +582,18 @@ RUST_GRAMMAR_PPT = {
         {'prod_lhs': 'Arguments', 'prod_rhs': ['Expression', ',', 'Arguments']},
 
         # Operators
-        {'prod_lhs': 'Relop', 'prod_rhs': ['<']},
-        {'prod_lhs': 'Relop', 'prod_rhs': ['<=']},
-        {'prod_lhs': 'Relop', 'prod_rhs': ['>']},
-        {'prod_lhs': 'Relop', 'prod_rhs': ['>=']},
-        {'prod_lhs': 'Relop', 'prod_rhs': ['==']},
-        {'prod_lhs': 'Relop', 'prod_rhs': ['!=']},
-
-        {'prod_lhs': 'AddOp', 'prod_rhs': ['+']},
-        {'prod_lhs': 'AddOp', 'prod_rhs': ['-']},
-
-        {'prod_lhs': 'MulOp', 'prod_rhs': ['*']},
-        {'prod_lhs': 'MulOp', 'prod_rhs': ['/']}
+        {'prod_lhs': 'Relop', 'prod_rhs': ['<'], 'bypass': True},
+        {'prod_lhs': 'Relop', 'prod_rhs': ['<='], 'bypass': True},
+        {'prod_lhs': 'Relop', 'prod_rhs': ['>'], 'bypass': True},
+        {'prod_lhs': 'Relop', 'prod_rhs': ['>='], 'bypass': True},
+        {'prod_lhs': 'Relop', 'prod_rhs': ['=='], 'bypass': True},
+        {'prod_lhs': 'Relop', 'prod_rhs': ['!='], 'bypass': True},
+
+        {'prod_lhs': 'AddOp', 'prod_rhs': ['+'], 'bypass': True},
+        {'prod_lhs': 'AddOp', 'prod_rhs': ['-'], 'bypass': True},
+
+        {'prod_lhs': 'MulOp', 'prod_rhs': ['*'], 'bypass': True},
+        {'prod_lhs': 'MulOp', 'prod_rhs': ['/'], 'bypass': True}
     ],
     'start_symbol' : 'Begin'
 }
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+词法分析结果缓存
+以源代码内容哈希和LexicalType版本为键，把词法元素序列以紧凑的二进制格式保存到磁盘，
+命中时直接还原词法元素而不再进行词法分析；缓存总大小超过上限时按最近使用时间淘汰
+
+文件格式（整体经zlib压缩）：
+    头部    magic、元素数、值数
+    值表    每个不同的值一项：类型标记 + 内容（int/str为UTF-8文本，float为8字节double）
+    kinds   array('B')，LexicalType编号
+    values  array('I')，值在值表中的编号
+    offsets array('I')，与上一个元素起始偏移的差值
+
+输入内容：源代码、词法元素列表
+输出内容：词法元素列表
+"""
+import hashlib
+import os
+import struct
+import sys
+import zlib
+sys.path.append(os.getcwd())
+from array import array
+from compiler_lexer import LexicalElement, LexicalType, lexical_type_signature
+from compiler_logger import logger
+
+TOKEN_CACHE_VERSION = 1 # 文件格式和词法规则版本，修改时递增，使旧缓存失效
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.build', 'tokens') # 缓存目录
+
+_MAGIC = b'TKC1'
+_HEADER = struct.Struct('<4sII')
+_VALUE_HEADER = struct.Struct('<BI') # 值类型标记，内容长度
+_NONE, _INT, _FLOAT, _STR = range(4) # 值类型标记
+_KINDS = list(LexicalType)
+_KIND_IDS = {kind: i for i, kind in enumerate(_KINDS)}
+
+def _encode(elements):
+    """把词法元素序列编码为压缩后的字节串"""
+    kinds = array('B')
+    value_ids = array('I')
+    offsets = array('I')
+    value_table = {} # (值的类型, 值) -> 编号，区分1和1.0
+    body = bytearray()
+    previous = 0
+    for element in elements:
+        value = element.value
+        key = (value.__class__, value)
+        value_id = value_table.get(key)
+        if value_id is None:
+            value_id = value_table[key] = len(value_table)
+            if value is None:
+                body += _VALUE_HEADER.pack(_NONE, 0)
+            elif isinstance(value, float):
+                body += _VALUE_HEADER.pack(_FLOAT, 8) + struct.pack('<d', value)
+            else:
+                content = str(value).encode('utf-8', 'surrogatepass')
+                body += _VALUE_HEADER.pack(_INT if isinstance(value, int) else _STR, len(content)) + content
+        kinds.append(_KIND_IDS[element.type])
+        value_ids.append(value_id)
+        offsets.append(element.offset - previous)
+        previous = element.offset
+    data = _HEADER.pack(_MAGIC, len(kinds), len(value_table)) + bytes(body) + kinds.tobytes() + value_ids.tobytes() + offsets.tobytes()
+    return zlib.compress(data, 1)
+
+def _decode(data, index):
+    """
+    把字节串还原为词法元素列表
+
+    :param index: 源代码的LineIndex
+    """
+    data = zlib.decompress(data)
+    magic, count, value_count = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError("Bad token cache file")
+    pos = _HEADER.size
+    values = []
+    for _ in range(value_count):
+        tag, size = _VALUE_HEADER.unpack_from(data, pos)
+        pos += _VALUE_HEADER.size
+        content = data[pos:pos + size]
+        pos += size
+        if tag == _NONE:
+            values.append(None)
+        elif tag == _FLOAT:
+            values.append(struct.unpack('<d', content)[0])
+        elif tag == _INT:
+            values.append(int(content))
+        else:
+            values.append(content.decode('utf-8', 'surrogatepass'))
+    columns = []
+    for typecode in ('B', 'I', 'I'):
+        column = array(typecode)
+        size = count * column.itemsize
+        column.frombytes(data[pos:pos + size])
+        pos += size
+        columns.append(column)
+    kinds, value_ids, deltas = columns
+    elements = []
+    offset = 0
+    for kind, value_id, delta in zip(kinds, value_ids, deltas):
+        offset += delta
+        elements.append(LexicalElement(_KINDS[kind], values[value_id], None, None, offset, index))
+    return elements
+
+class TokenCache:
+    """磁盘上的词法分析结果缓存，每个源代码一个文件，按文件修改时间实现LRU淘汰"""
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=64 << 20):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存文件总大小上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._version = hashlib.sha256(repr((TOKEN_CACHE_VERSION, lexical_type_signature(), sys.byteorder)).encode('utf-8')).digest()
+
+    def _path(self, text):
+        """源代码对应的缓存文件路径"""
+        digest = hashlib.sha256(self._version + text.encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.tok")
+
+    def load(self, text, index):
+        """
+        读取源代码的缓存结果，未命中返回None
+
+        :param text: 源代码
+        :param index: 源代码的LineIndex，还原的词法元素由其计算行列号
+        """
+        path = self._path(text)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        try:
+            elements = _decode(data, index)
+        except Exception as e: # 缓存损坏时删除并当作未命中
+            logger.warning(f"读取词法缓存失败: {e}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path) # 更新最近使用时间
+        except OSError:
+            pass
+        return elements
+
+    def store(self, text, elements):
+        """保存源代码的词法分析结果，并按总大小淘汰最久未使用的缓存"""
+        path = self._path(text)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(_encode(elements))
+            os.replace(temp_path, path) # 原子替换，避免并发写入产生不完整的缓存
+        except OSError as e:
+            logger.warning(f"写入词法缓存失败: {e}")
+            return
+        self._evict()
+
+    def clear(self):
+        """删除全部缓存文件"""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+        """缓存文件列表：(路径, 大小, 最近使用时间)"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.tok'):
+                        stat = entry.stat()
+                        entries.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self):
+        """总大小超过上限时，从最久未使用的缓存开始删除"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,125 @@
+"""
+测试公共设置：把编译器目录加入模块搜索路径，只输出错误日志，提供各测试共用的程序和语法分析器
+在Rust-like compiler目录下运行：python -m pytest tests
+"""
+import logging
+import os
+import random
+import sys
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from compiler_logger import logger
+from compiler_parser import SyntaxParser
+from compiler_rust_grammar import RUST_GRAMMAR_PPT
+
+logger.setLevel(logging.CRITICAL) # 词法错误等日志由测试本身检查
+
+SAMPLE_PROGRAM = '''// 示例程序
+fn add(a:i32) -> i32 {
+    return a + 1;
+}
+/* 多行
+   注释 */
+fn main() {
+    let mut x : i32 = 1;
+    let y = 2;
+    let mut arr : [i32; 3] = [1, 2, 3];
+    let t : (i32, i32) = (1, 2);
+    x = add(x) * 3 - 4 / 2;
+    if x > 10 {
+        x = x - 1;
+    } else {
+        x = x + 1;
+    }
+    while x < 100 {
+        x = x + arr[1];
+    }
+    for i in 1..10 {
+        x = x + i;
+    }
+    let z = t.0;
+    let r = &mut x;
+    loop { break; }
+}
+'''
+
+# 含语义错误的程序：给不可变变量赋值、未声明的变量、参数数量不匹配、类型不匹配、使用未初始化的变量
+SEMANTIC_ERROR_PROGRAMS = [
+    "fn main() { let a = 1; a = 2; }",
+    "fn main() { x = 1; }",
+    "fn f(a: i32) -> i32 { return a; } fn main() { let b = f(1, 2); }",
+    "fn main() { let mut a: i32 = 1; let b = (1, 2); a = b; }",
+    "fn main() { let a: i32; let c = a + 1; }",
+]
+
+# 含语法错误的程序
+SYNTAX_ERROR_PROGRAMS = [
+    "fn main() { let a = 1 }",
+    "fn main() { let a = 1 + ; }",
+    "fn main() { let = 1; }",
+    "fn main() { x = (1 + 2; }",
+    "fn main( { }",
+    "fn main() { let a = 1; ",
+]
+
+def random_program(seed):
+    """生成随机的类Rust程序：随机嵌套的赋值、条件、循环语句和四则运算表达式"""
+    rng = random.Random(seed)
+    names = ['x', 'y', 'z']
+
+    def expression(depth):
+        if depth <= 0 or rng.random() < 0.3:
+            return rng.choice([str(rng.randint(0, 99)), rng.choice(names), f"arr[{rng.randint(0, 2)}]", f"f0({rng.choice(names)})"])
+        left, right = expression(depth - 1), expression(depth - 1)
+        return rng.choice([f"{left} + {right}", f"{left} - {right}", f"{left} * {right}", f"{left} / {right}", f"({left})"])
+
+    def condition():
+        return f"{expression(2)} {rng.choice(['<', '<=', '>', '>=', '==', '!='])} {expression(2)}"
+
+    def statement(depth):
+        name = rng.choice(names)
+        kind = rng.random() if depth > 0 else 0
+        if kind < 0.35:
+            return f"{name} = {expression(3)};"
+        if kind < 0.5:
+            return f"if {condition()} {{ {statement(depth - 1)} }} else {{ {statement(depth - 1)} }}"
+        if kind < 0.6:
+            return f"if {condition()} {{ {statement(depth - 1)} {statement(depth - 1)} }}"
+        if kind < 0.7:
+            return f"while {condition()} {{ {statement(depth - 1)} }}"
+        if kind < 0.78:
+            return f"for i in 0..{expression(1)} {{ {name} = {name} + i; }}"
+        if kind < 0.85:
+            return f"arr[{rng.randint(0, 2)}] = {expression(2)};"
+        if kind < 0.9:
+            return f"loop {{ {statement(depth - 1)} break; }}"
+        if kind < 0.95:
+            return f"t.0 = {expression(2)};"
+        return f"return {expression(2)};"
+
+    body = ["let mut x: i32 = 1;", "let mut y: i32 = 2;", "let mut z = 3;", "let mut arr: [i32; 3] = [1, 2, 3];", "let mut t: (i32, i32) = (1, 2);"]
+    body += [statement(3) for _ in range(rng.randint(3, 12))]
+    return "fn f0(mut a: i32) -> i32 {\n    return a * 2 + 1;\n}\nfn main() {\n" + ''.join(f"    {line}\n" for line in body) + "}\n"
+
+@pytest.fixture(scope='session')
+def programs():
+    """语法正确的程序（部分含语义错误）"""
+    return [SAMPLE_PROGRAM, *SEMANTIC_ERROR_PROGRAMS, *(random_program(seed) for seed in range(40))]
+
+@pytest.fixture(scope='session')
+def syntax_error_programs():
+    return SYNTAX_ERROR_PROGRAMS
+
+@pytest.fixture(scope='session')
+def build_parser():
+    """按(构造方法, 是否跳过单一产生式规约)构建SyntaxParser，同一组参数只构建一次"""
+    parsers = {}
+
+    def build(mode='lr1', bypass=False):
+        key = (mode, bypass)
+        if key not in parsers:
+            parser = SyntaxParser()
+            parser.build_table(RUST_GRAMMAR_PPT, mode, bypass=bypass)
+            parsers[key] = parser
+        return parsers[key]
+    return build
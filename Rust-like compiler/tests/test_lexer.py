@@ -0,0 +1,261 @@
+"""词法分析器测试：各引擎和入口的分析结果与逐字符引擎一致"""
+import random
+import tracemalloc
+import pytest
+import compiler_lexer_dfa
+from compiler_lexer import LexicalError, LexicalType, StringPool, TokenBuffer, Tokenize
+from compiler_lexer_batch import lex_files
+
+# 随机输入的片段：关键字、运算符、注释、字符串，以及非ASCII的字母、数字、数值字符和空白
+_PIECES = ['a', 'b', '1', '2', '.', ' ', '\n', '/', '*', '"', '\\', '=', '<', '>', '-', '_', 'fn', 'let', '//', '/*', '*/',
+           '(', ')', '{', ';', '$', 'é', 'π', 'ß', '一', 'Ω1', '½', 'x½', '1½', '²', '٣', '1.٣', 'Ⅻ', ' ', '　']
+
+def _key(elements):
+    return [(e.type, e.value, e.offset, e.line, e.column) for e in elements]
+
+def _lex(analyse, text):
+    """分析结果，出错时为错误信息"""
+    try:
+        return _key(analyse(text))
+    except LexicalError as error:
+        return str(error)
+
+def _random_texts(seed, count, length=20):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(_PIECES) for _ in range(rng.randint(0, length))) for _ in range(count)]
+
+def test_regex_engine_matches_char_engine():
+    for text in _random_texts(1, 2000):
+        assert _lex(Tokenize('regex').analyse, text) == _lex(Tokenize('char').analyse, text), text
+
+@pytest.mark.parametrize('engine', ['char', 'regex'])
+def test_non_ascii_characters(engine):
+    tokens = Tokenize(engine).analyse('é1 π_½ 一٣')
+    assert [(t.type, t.value) for t in tokens] == [(LexicalType.IDENTIFIER, 'é1'), (LexicalType.IDENTIFIER, 'π_½'),
+                                                   (LexicalType.IDENTIFIER, '一٣'), (LexicalType.EOF, None)]
+    assert Tokenize(engine).analyse('٣ 1')[0].value == 3 # Unicode十进制数字
+    with pytest.raises(LexicalError, match='line 1, column 5: Unknown character: ½'):
+        Tokenize(engine).analyse('a = ½')
+    with pytest.raises(LexicalError, match='Invalid numeric literal: ²'):
+        Tokenize(engine).analyse('a = ²')
+
+def test_entry_points_match_char_engine(tmp_path):
+    """DFA引擎、字节缓冲区、TokenBuffer和批量分析（非ASCII输入都转交组合正则引擎）与逐字符引擎一致"""
+    texts = _random_texts(2, 600)
+    paths = []
+    for i, text in enumerate(texts):
+        path = tmp_path / f"{i}.rs"
+        path.write_text(text, encoding='utf-8')
+        paths.append(str(path))
+    batch = dict(lex_files(paths, max_workers=1))
+    for text, path in zip(texts, paths):
+        expected = _lex(Tokenize('char').analyse, text)
+        assert _lex(Tokenize('dfa').analyse, text) == expected, text
+        assert _lex(lambda text: Tokenize().analyse_bytes(text.encode()), text) == expected, text
+        assert _lex(Tokenize().analyse_buffer, text) == expected, text
+        assert _lex(lambda text: list(Tokenize().iter_tokens([text[i:i + 3] for i in range(0, len(text), 3)])), text) == expected, text
+        result = batch[path]
+        assert (str(result) if isinstance(result, LexicalError) else _key(result)) == expected, text
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+def test_number_followed_by_dot_and_digits(engine):
+    """数字之后的'.'和数字不属于该数字，不报错"""
+    tokens = Tokenize(engine).analyse('1.5.2 1..2')
+    assert [(t.type, t.value, t.offset) for t in tokens] == [
+        (LexicalType.FLOAT, 1.5, 0), (LexicalType.DOT, '.', 3), (LexicalType.INTEGER, 2, 4),
+        (LexicalType.INTEGER, 1, 6), (LexicalType.DOTDOT, '..', 7), (LexicalType.INTEGER, 2, 9), (LexicalType.EOF, None, 10)]
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+@pytest.mark.parametrize('entry', [Tokenize.analyse, lambda lexer, text: lexer.analyse_bytes(text.encode())])
+def test_positions_after_block_comment(engine, entry):
+    """多行注释中的换行只计一次（原逐字符引擎计两次，注释之后的行号偏大），注释之后的元素和错误按实际所在行报告"""
+    tokens = entry(Tokenize(engine), 'let a;\n/* one\n   two */ let b;\nc')
+    assert [(t.value, t.line, t.column) for t in tokens if t.type is LexicalType.IDENTIFIER] == [('a', 1, 5), ('b', 3, 15), ('c', 4, 1)]
+    with pytest.raises(LexicalError, match='line 2, column 6: Unknown character: \\$'):
+        entry(Tokenize(engine), '/* a\nb */ $')
+    with pytest.raises(LexicalError, match='line 3, column 8: Unterminated multi-line comment'):
+        entry(Tokenize(engine), '/* a\nb */\n/* open')
+
+_MULTI_ERROR_SOURCE = 'let a = 1 $ b;\nlet c = "abc\nlet d = 2 @ 3;\n/* open'
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+def test_recovery_reports_every_error_in_source_order(engine):
+    lexer = Tokenize(engine, recover=True)
+    tokens = lexer.analyse(_MULTI_ERROR_SOURCE)
+    # 未结束的字符串在开始的引号处报告，出错范围到该行行尾
+    assert [(d.line, d.column, d.start, d.end, str(d).split(': ', 1)[1]) for d in lexer.diagnostics] == [
+        (1, 11, 10, 11, 'Unknown character: $'),
+        (2, 9, 23, 27, 'Unterminated string literal'),
+        (3, 11, 38, 39, 'Unknown character: @'),
+        (4, 8, 43, 50, 'Unterminated multi-line comment'),
+    ]
+    assert [(t.value, t.line) for t in tokens if t.type is LexicalType.ERROR] == [('$', 1), ('"abc', 2), ('@', 3), ('/* open', 4)]
+    assert [t.value for t in tokens if t.type is LexicalType.IDENTIFIER] == ['a', 'b', 'c', 'd']
+    bytes_lexer = Tokenize(engine, recover=True)
+    assert _key(bytes_lexer.analyse_bytes(_MULTI_ERROR_SOURCE.encode())) == _key(tokens)
+    assert [str(d) for d in bytes_lexer.diagnostics] == [str(d) for d in lexer.diagnostics]
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+@pytest.mark.parametrize('recover', [False, True])
+def test_analyse_buffer_uses_engine_and_recovery(engine, recover, monkeypatch):
+    """analyse_buffer使用当前引擎和恢复模式，每次分析重建字符串池，不支持TokenCache"""
+    source = _MULTI_ERROR_SOURCE if recover else 'let a = 1;\nlet s = "abc";\nb = a + 2.5;'
+    lexer = Tokenize(engine, recover)
+    expected = lexer.analyse(source)
+    diagnostics = [str(d) for d in lexer.diagnostics]
+    calls = []
+    for name, owner, attr in [('char', Tokenize, '_get_next_element'), ('regex', Tokenize, '_iter_spans'),
+                              ('dfa', compiler_lexer_dfa.LexerDFA, 'iter_spans')]:
+        original = getattr(owner, attr)
+        monkeypatch.setattr(owner, attr, lambda *args, _name=name, _original=original: (calls.append(_name), _original(*args))[1])
+    lexer.analyse_buffer('let x = "y";')
+    tokens = lexer.analyse_buffer(source)
+    assert set(calls) == {engine}
+    assert _key(tokens) == _key(expected)
+    assert [str(d) for d in lexer.diagnostics] == diagnostics
+    assert [t.string_id for t in tokens] == [e.string_id for e in expected] # 字符串池只包含本次分析的字符串
+    assert all(source[t.offset:t.offset + t.length] == t.value for t in tokens if t.type is LexicalType.IDENTIFIER)
+    if not recover:
+        with pytest.raises(LexicalError, match='Unknown character: \\$'):
+            lexer.analyse_buffer(_MULTI_ERROR_SOURCE)
+    with pytest.raises(ValueError, match='token cache'):
+        Tokenize(engine, recover, cache=object()).analyse_buffer('let a;')
+
+def test_token_buffer_iterates_views_lazily():
+    """迭代TokenBuffer时逐个创建TokenView，不分配与元素数成正比的内存"""
+    tokens = Tokenize('regex').analyse_buffer('let a = b;' * 20000)
+    tracemalloc.start()
+    iterator = iter(tokens)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 4096
+    assert [t.value for t in iterator][:6] == ['let', 'a', '=', 'b', ';', 'let']
+    assert [t.offset for t in tokens] == [tokens[i].offset for i in range(len(tokens))]
+
+def test_string_pool_interns_in_first_seen_order():
+    pool = StringPool()
+    first = ''.join(['na', 'me'])
+    assert [pool.intern(first), pool.intern('other'), pool.intern(''.join(['na', 'me']))] == [0, 1, 0]
+    assert pool[0] is first and pool.strings == ['name', 'other'] and len(pool) == 2
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+def test_engines_intern_identifiers_and_strings_alike(engine):
+    """标识符和字符串字面量按首次出现顺序编号，相同的值为同一个对象，各引擎一致"""
+    source = 'let abc = "x"; abc = abc + x1; let s = "x"; x = abc; /* abc */ let 半径 = "abc";'
+    lexer = Tokenize(engine)
+    tokens = lexer.analyse(source)
+    pooled = [t for t in tokens if t.type in (LexicalType.IDENTIFIER, LexicalType.STRING)]
+    assert [(t.value, t.string_id) for t in pooled] == [('abc', 0), ('x', 1), ('abc', 0), ('abc', 0), ('x1', 2), ('s', 3),
+                                                         ('x', 1), ('x', 1), ('abc', 0), ('半径', 4), ('abc', 0)]
+    assert lexer.strings.strings == ['abc', 'x', 'x1', 's', '半径']
+    assert all(t.value is lexer.strings[t.string_id] for t in pooled)
+    assert all(t.string_id is None for t in tokens if t not in pooled)
+
+def test_recovery_matches_across_engines():
+    for text in _random_texts(3, 800, 30):
+        lexers = {engine: Tokenize(engine, recover=True) for engine in ('char', 'regex', 'dfa')}
+        results = {engine: (_key(lexer.analyse(text)), [str(d) for d in lexer.diagnostics]) for engine, lexer in lexers.items()}
+        assert results['regex'] == results['char'] == results['dfa'], text
+        starts = [d.start for d in lexers['char'].diagnostics]
+        assert starts == sorted(starts), text
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+@pytest.mark.parametrize('entry', [Tokenize.analyse, lambda lexer, text: lexer.analyse_bytes(text.encode()),
+                                   lambda lexer, text: list(lexer.iter_tokens(text))])
+def test_unterminated_string_position(engine, entry):
+    """未结束的字符串默认在文件末尾报告（与以往一致），恢复模式下在开始的引号处报告"""
+    text = 'let a;\nlet c = "abc\nlet d = 2;\n'
+    with pytest.raises(LexicalError, match='line 4, column 1: Unterminated string literal') as error:
+        entry(Tokenize(engine), text)
+    assert (error.value.start, error.value.end) == (15, 19)
+    lexer = Tokenize(engine, recover=True)
+    entry(lexer, text)
+    assert [(d.line, d.column, d.start, d.end) for d in lexer.diagnostics] == [(2, 9, 15, 19)]
+
+@pytest.mark.parametrize('engine', ['char', 'regex', 'dfa'])
+def test_relex_matches_full_lex(engine):
+    """随机编辑后增量分析的结果与重新完整分析一致；出错时报告相同的错误且原有元素不变"""
+    rng = random.Random(4)
+    lexer = Tokenize(engine)
+    for text in _random_texts(5, 300, 30):
+        try:
+            tokens = lexer.analyse(text)
+        except LexicalError:
+            continue
+        for _ in range(5):
+            offset = rng.randint(0, len(text))
+            deleted = rng.randint(0, min(4, len(text) - offset))
+            inserted = ''.join(rng.choice(_PIECES) for _ in range(rng.randint(0, 3)))
+            edited = text[:offset] + inserted + text[offset + deleted:]
+            expected = _lex(Tokenize(engine).analyse, edited)
+            before = _key(tokens)
+            try:
+                tokens, (start, stop) = lexer.relex(tokens, edited, offset, deleted, inserted)
+            except LexicalError as error:
+                assert str(error) == expected, (text, edited)
+                assert _key(tokens) == before
+                break
+            assert _key(tokens) == expected, (text, edited)
+            assert 0 <= start <= stop <= len(tokens)
+            text = edited
+
+_UNICODE_SOURCE = '''// 注释：计算 π 的近似值
+fn main() {
+    let mut 半径: i32 = 2; /* 多行
+       注释 ü */
+    let s = "字符串\\n\\"é\\"";
+    半径 = 半径 * 3;
+}
+'''
+
+@pytest.mark.parametrize('wrap', [bytes, bytearray, memoryview])
+def test_analyse_bytes_matches_char_engine(wrap):
+    expected = _key(Tokenize('char').analyse(_UNICODE_SOURCE))
+    assert _key(Tokenize().analyse_bytes(wrap(_UNICODE_SOURCE.encode()))) == expected
+    ascii_source = 'fn main() { let a = 1.5 + b >>= 2; /* x */ "s" }\n'
+    assert _key(Tokenize().analyse_bytes(wrap(ascii_source.encode()))) == _key(Tokenize('char').analyse(ascii_source))
+
+class _RecordingBuffer(bytearray):
+    """记录切片长度的字节缓冲区，用于检查字节引擎每次复制的字节数"""
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self.slices.append(len(range(*key.indices(len(self)))))
+        return super().__getitem__(key)
+
+def test_analyse_bytes_decodes_only_non_ascii_tokens():
+    """非ASCII的词法元素只解码所在的窗口，之后继续按字节分析；结果为TokenBuffer"""
+    source = 'let 半径 = 1;\n' + 'let a = b + 2.5;\n' * 2000 + 'let ü1 = "é";\n'
+    buffer = _RecordingBuffer(source.encode())
+    buffer.slices = []
+    tokens = Tokenize().analyse_bytes(buffer)
+    assert isinstance(tokens, TokenBuffer)
+    assert _key(tokens) == _key(Tokenize('char').analyse(source))
+    assert buffer.slices == [len('半径'.encode()), len('ü1'.encode())] # 只复制这两个标识符
+    buffer = _RecordingBuffer((source + 'let s = "é\n\n').encode())
+    buffer.slices = []
+    with pytest.raises(LexicalError, match='line 2005, column 1: Unterminated string literal'):
+        Tokenize().analyse_bytes(buffer)
+    assert buffer.slices[2:] == [len('"é'.encode()), 0, 0] # 直到文件结束都没有闭合时逐行解码剩余部分
+
+def test_analyse_file_uses_mmap(tmp_path):
+    path = tmp_path / 'main.rs'
+    path.write_bytes(_UNICODE_SOURCE.encode())
+    lexer = Tokenize()
+    tokens = lexer.analyse_file(str(path))
+    assert _key(tokens) == _key(Tokenize('char').analyse(_UNICODE_SOURCE))
+    assert [t.value for t in tokens if t.type is LexicalType.STRING] == ['字符串\n"é"']
+    identifier = next(t for t in tokens if t.type is LexicalType.IDENTIFIER and t.value == '半径')
+    assert lexer.strings.strings[identifier.string_id] == '半径'
+    empty = tmp_path / 'empty.rs'
+    empty.write_bytes(b'')
+    assert _key(Tokenize().analyse_file(str(empty))) == [(LexicalType.EOF, None, 0, 1, 1)]
+
+def test_dfa_cache_replaces_stale_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(compiler_lexer_dfa, '_LEXER_DFA', None)
+    (tmp_path / 'lexer_dfa_0123456789abcdef.pickle').write_bytes(b'stale')
+    (tmp_path / 'parse_table_Begin_lr1_0123456789abcdef.pickle').write_bytes(b'other')
+    dfa = compiler_lexer_dfa.load_lexer_dfa(str(tmp_path))
+    assert {path.name for path in tmp_path.iterdir()} == {f"lexer_dfa_{compiler_lexer_dfa.lexical_type_hash()}.pickle",
+                                                         'parse_table_Begin_lr1_0123456789abcdef.pickle'}
+    monkeypatch.setattr(compiler_lexer_dfa, '_LEXER_DFA', None)
+    assert compiler_lexer_dfa.load_lexer_dfa(str(tmp_path)).transitions == dfa.transitions
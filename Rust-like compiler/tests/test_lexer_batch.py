@@ -0,0 +1,39 @@
+"""批量词法分析测试：进程池返回的TokenBuffer与逐个分析的结果一致"""
+import pickle
+from compiler_lexer import LexicalError, Tokenize
+from compiler_lexer_batch import lex_files
+
+def _key(elements):
+    return [(e.type, e.value, e.offset, e.line, e.column) for e in elements]
+
+def _write_sources(tmp_path):
+    sources = [f"fn f{i}() {{\n    let x{i} = {i} + {i}.5; // 注释{i}\n    let s = \"é{i}\";\n}}\n" * (i + 1) for i in range(6)]
+    sources.insert(3, 'let a = $;') # 词法错误只影响该文件
+    paths = []
+    for i, source in enumerate(sources):
+        path = tmp_path / f"{i}.rs"
+        path.write_text(source, encoding='utf-8')
+        paths.append(str(path))
+    return sources, paths + [str(tmp_path / 'missing.rs')]
+
+def test_pool_matches_single_file_lexing(tmp_path):
+    sources, paths = _write_sources(tmp_path)
+    for max_workers in (1, 2):
+        results = lex_files(paths, max_workers=max_workers, chunksize=2)
+        assert [path for path, _ in results] == paths # 结果顺序与输入一致
+        for source, (_, result) in zip(sources, results):
+            try:
+                expected = _key(Tokenize('char').analyse(source))
+            except LexicalError as error:
+                assert isinstance(result, LexicalError) and str(result) == str(error)
+            else:
+                assert _key(result) == expected
+        assert isinstance(results[-1][1], OSError)
+
+def test_token_buffer_pickles_compactly(tmp_path):
+    sources, paths = _write_sources(tmp_path)
+    (_, buffer), = lex_files(paths[5:6], max_workers=1)
+    restored = pickle.loads(pickle.dumps(buffer))
+    assert _key(restored) == _key(buffer)
+    tokens = Tokenize().analyse(sources[5])
+    assert len(pickle.dumps(buffer)) < len(pickle.dumps(tokens))
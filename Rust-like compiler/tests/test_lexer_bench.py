@@ -0,0 +1,45 @@
+"""词法分析器性能测试模块的测试：生成的源代码可被各引擎一致地分析，报告内容完整"""
+import pytest
+from compiler_lexer import Tokenize
+from compiler_lexer_bench import _parse_mix, _parse_size, benchmark, benchmark_batch, generate_source, profile
+from compiler_logger import logger
+
+def test_generate_source_is_deterministic():
+    source = generate_source(4096, seed=3)
+    assert source == generate_source(4096, seed=3) != generate_source(4096, seed=4)
+    assert len(source) >= 4096
+    only_let = generate_source(2048, {'let': 1})
+    assert all(line.startswith(('fn ', '    let ', '}')) for line in only_let.splitlines() if line)
+
+def test_benchmark_engines_agree():
+    source = generate_source(8192, seed=1)
+    level = logger.level
+    results = benchmark(source, repeat=1)
+    assert logger.level == level
+    assert [result['engine'] for result in results] == ['char', 'regex', 'dfa', 'buffer', 'bytes', 'file']
+    assert {result['tokens'] for result in results} == {len(Tokenize('char').analyse(source))}
+    for result in results:
+        assert result['seconds'] > 0 and result['tokens_per_sec'] > 0 and result['mb_per_sec'] > 0 and result['peak_mb'] > 0
+
+def test_profile_reports_process_methods():
+    report = profile(generate_source(2048), 'char')
+    assert '_process_identifier' in report and '_get_next_element' in report
+
+def test_command_line_options():
+    assert _parse_size('4096') == 4096 and _parse_size('512k') == 512 << 10 and _parse_size('1.5M') == 3 << 19
+    assert _parse_mix('let=3,if=1') == {'let': 3.0, 'if': 1.0}
+    with pytest.raises(ValueError, match='Unknown statement kind'):
+        _parse_mix('goto=1')
+
+def test_benchmark_batch_reports_each_worker_count():
+    source = generate_source(4096, seed=2)
+    results = benchmark_batch(source, files=3, workers=(1, 2), repeat=1)
+    assert [result['workers'] for result in results] == [1, 2]
+    assert {result['tokens'] for result in results} == {3 * len(Tokenize('regex').analyse(source))}
+    assert results[0]['speedup'] == 1.0 and all(result['tokens_per_sec'] > 0 and result['speedup'] > 0 for result in results)
+    assert all(result['failed'] == 0 for result in results)
+
+def test_benchmark_batch_reports_failed_files():
+    """lex_files对出错的文件返回异常，不计入元素数"""
+    results = benchmark_batch('let a = $;', files=2, workers=(1, 2), repeat=1)
+    assert [(result['tokens'], result['failed']) for result in results] == [(0, 2), (0, 2)]
@@ -0,0 +1,431 @@
+"""语法分析器测试"""
+import gc
+import io
+import os
+import subprocess
+import sys
+from collections import defaultdict
+import pytest
+from compiler_lexer import LexicalType, Tokenize
+from compiler_parse_trace import ParseTrace
+from compiler_parser import SyntaxParser, grammar_hash
+from compiler_parser_node import ParseNode
+from compiler_rust_grammar import RUST_GRAMMAR_PPT
+from compiler_semantic_checker import SemanticChecker
+
+class _RecordingChecker(SemanticChecker):
+    """记录每次on_reduce回调的节点符号"""
+    def __init__(self):
+        super().__init__()
+        self.reduced = []
+
+    def on_reduce(self, node):
+        self.reduced.append(node.symbol)
+        super().on_reduce(node)
+
+class _RecordingDict(dict):
+    """每次get时调用on_get的字典，用于观察分析循环内部的状态"""
+    def __init__(self, items, on_get):
+        super().__init__(items)
+        self.on_get = on_get
+
+    def get(self, key, default=None):
+        self.on_get()
+        return super().get(key, default)
+
+def _tree(node):
+    """语法树的嵌套元组形式"""
+    if node.token is not None:
+        return node.symbol, node.token.value
+    return node.symbol, tuple(_tree(child) for child in node.children)
+
+def _output(checker):
+    return [str(quad) for quad in checker.get_quads()], [str(error) for error in checker.get_errors()]
+
+def _run(parser, source, **options):
+    """分析结果：(语法树, 四元式, 语义错误, 回调的节点符号)，语法错误时为错误信息"""
+    checker = _RecordingChecker()
+    try:
+        root, _ = parser.parse(Tokenize().analyse(source), checker=checker, **options)
+    except SyntaxError as error:
+        return str(error)
+    return (_tree(root), *_output(checker), checker.reduced)
+
+def _reference_parse(parser, tokens, checker=None, trace=False):
+    """原先的分析循环：在ACTION/GOTO字典表上运行，trace为True时每步记录完整快照"""
+    steps = []
+    state_stack = [0]
+    node_stack = []
+    idx = 0
+    token_list = list(tokens)
+    while True:
+        state = state_stack[-1]
+        cur_token = token_list[idx]
+        step = {
+            "stack": list(state_stack),
+            "node_stack": [str(n) for n in node_stack],
+            "input": [str(t) for t in token_list[idx:]],
+            "action": "",
+            "production": ""
+        } if trace else {}
+        action = parser.action[state].get(cur_token.type.value)
+        if not action:
+            raise SyntaxError(
+                f"语法错误（第{cur_token.line}行, 第{cur_token.column}列）\n"
+                f"意外Token: {cur_token}\n"
+                f"期望: {sorted(parser.action[state].keys())}"
+            )
+        if action[0] == 'shift':
+            step["action"] = f"移入: {cur_token} -> 状态{action[1]}"
+            node_stack.append(ParseNode(symbol=cur_token.type.value, children=None, token=cur_token))
+            idx += 1
+            state_stack.append(action[1])
+        elif action[0] == 'reduce':
+            prod = parser.rule_index_map[action[1]]
+            rhs_len = len(prod['rhs'])
+            step["production"] = f"{prod['lhs']} → {' '.join(prod['rhs']) if prod['rhs'] else 'ε'}"
+            step["action"] = f"规约: 使用产生式 {action[1]}"
+            children = []
+            if rhs_len > 0:
+                state_stack = state_stack[:-rhs_len]
+                children = node_stack[-rhs_len:]
+                node_stack = node_stack[:-rhs_len]
+            new_node = ParseNode(symbol=prod['lhs'], children=children)
+            if checker:
+                checker.on_reduce(node=new_node)
+            node_stack.append(new_node)
+            state_stack.append(parser.goto_tbl[state_stack[-1]][prod['lhs']])
+        else:
+            break
+        if trace:
+            steps.append(step)
+    return node_stack[0], steps
+
+def _error_position(message):
+    """语法错误信息中的位置和意外Token，不含期望的Token集合和上下文"""
+    return message.split('\n')[:2]
+
+def _collapse_units(tree, grammar):
+    """去掉语法树中标记了'bypass'的单一产生式节点，子节点取该节点的符号，与跳过单一产生式规约得到的语法树相同"""
+    units = {(prod['prod_lhs'], prod['prod_rhs'][0]) for prod in grammar['productions'] if prod.get('bypass')}
+
+    def collapse(node):
+        symbol, children = node
+        if not isinstance(children, tuple): # Token节点
+            return node
+        if len(children) == 1 and (symbol, children[0][0]) in units:
+            return symbol, collapse(children[0])[1]
+        return symbol, tuple(collapse(child) for child in children)
+    return collapse(tree)
+
+def _grammar(productions, terminals):
+    """由(左部, 右部)列表构造小文法，开始符号为S'"""
+    return {'start_symbol': "S'", 'terminals': terminals,
+            'productions': [{'prod_lhs': lhs, 'prod_rhs': rhs.split()} for lhs, rhs in productions]}
+
+# 合并同心状态后A→c和B→c在d、e上新引入归约-归约冲突
+_MERGE_GRAMMAR = _grammar([("S'", 'S'), ('S', 'a A d'), ('S', 'b B d'), ('S', 'a B e'), ('S', 'b A e'), ('A', 'c'), ('B', 'c')], ['a', 'b', 'c', 'd', 'e'])
+# 规范LR(1)中已有A→c和B→c在x上的冲突
+_INHERENT_GRAMMAR = _grammar([("S'", 'S'), ('S', 'A x'), ('S', 'B x'), ('S', 'A y'), ('A', 'c'), ('B', 'c')], ['c', 'x', 'y'])
+
+def _reference_lr1(grammar):
+    """逐项目求闭包的教科书式规范LR(1)构造，不使用缓存：返回各状态的项目集、转移和每个符号上的候选动作集合"""
+    productions = [(prod['prod_lhs'], tuple(prod['prod_rhs'])) for prod in grammar['productions']]
+    start = grammar['start_symbol']
+    by_lhs = defaultdict(list)
+    for idx, (lhs, _) in enumerate(productions):
+        by_lhs[lhs].append(idx)
+    first, nullable = defaultdict(set), set()
+    changed = True
+    while changed:
+        changed = False
+        for lhs, rhs in productions:
+            before = len(first[lhs]), lhs in nullable
+            for sym in rhs:
+                first[lhs] |= first[sym] if sym in by_lhs else {sym}
+                if sym not in nullable:
+                    break
+            else:
+                nullable.add(lhs)
+            changed |= before != (len(first[lhs]), lhs in nullable)
+
+    def first_of(symbols, lookahead):
+        result = set()
+        for sym in symbols:
+            result |= first[sym] if sym in by_lhs else {sym}
+            if sym not in nullable:
+                return result
+        return result | {lookahead}
+
+    def closure(kernel):
+        items, work = set(kernel), list(kernel)
+        while work:
+            idx, dot, lookahead = work.pop()
+            rhs = productions[idx][1]
+            if dot < len(rhs) and rhs[dot] in by_lhs:
+                for follow in first_of(rhs[dot + 1:], lookahead):
+                    for sub in by_lhs[rhs[dot]]:
+                        if (sub, 0, follow) not in items:
+                            items.add((sub, 0, follow))
+                            work.append((sub, 0, follow))
+        return frozenset(items)
+
+    states = [closure({(by_lhs[start][0], 0, '$')})]
+    index, transitions, actions = {states[0]: 0}, [], []
+    for state in states:
+        targets, cells = defaultdict(set), defaultdict(set)
+        for idx, dot, lookahead in state:
+            lhs, rhs = productions[idx]
+            if dot < len(rhs):
+                targets[rhs[dot]].add((idx, dot + 1, lookahead))
+            elif lhs == start and lookahead == '$':
+                cells['$'].add(('accept',))
+            else:
+                cells[lookahead].add(('reduce', productions.index((lhs, rhs)))) # 重复的产生式按第一个规约
+        moves = {}
+        for sym, kernel in targets.items():
+            target = closure(kernel)
+            if target not in index:
+                index[target] = len(states)
+                states.append(target)
+            moves[sym] = index[target]
+            if sym not in by_lhs:
+                cells[sym].add(('shift',))
+        transitions.append(moves)
+        actions.append(dict(cells))
+    return states, transitions, actions
+
+def _merge_cores(states, transitions, actions):
+    """合并规范LR(1)中核心相同的状态，得到LALR(1)的转移和候选动作集合"""
+    ids = {}
+    merged = [ids.setdefault(frozenset((idx, dot) for idx, dot, _ in state), len(ids)) for state in states]
+    moves, cells = [{} for _ in ids], [defaultdict(set) for _ in ids]
+    for sid, target in enumerate(merged):
+        moves[target].update((sym, merged[to]) for sym, to in transitions[sid].items())
+        for sym, candidates in actions[sid].items():
+            cells[target][sym] |= candidates
+    return moves, [dict(cell) for cell in cells]
+
+def _automaton(parser):
+    """分析表各状态的转移和每个符号上的候选动作集合，包括冲突中被覆盖的动作"""
+    transitions, actions = [], []
+    for sid in range(len(parser.action)):
+        moves, cells = dict(parser.goto_tbl[sid]), defaultdict(set)
+        for sym, action in parser.action[sid].items():
+            cells[sym].add(action)
+        transitions.append(moves)
+        actions.append(cells)
+    for c in parser.conflicts:
+        actions[c.state][c.symbol] |= {c.previous, c.chosen}
+    for moves, cells in zip(transitions, actions):
+        for sym, candidates in cells.items():
+            moves.update((sym, action[1]) for action in candidates if action[0] == 'shift')
+            cells[sym] = {action if action[0] != 'shift' else ('shift',) for action in candidates}
+    return transitions, [dict(cells) for cells in actions]
+
+def _isomorphic(left, right):
+    """两个自动机从初始状态起按相同符号转移的状态一一对应，且对应状态的候选动作相同"""
+    (left_moves, left_cells), (right_moves, right_cells) = left, right
+    mapping, work = {0: 0}, [0]
+    while work:
+        sid = work.pop()
+        other = mapping[sid]
+        if left_moves[sid].keys() != right_moves[other].keys() or left_cells[sid] != right_cells[other]:
+            return False
+        for sym, target in left_moves[sid].items():
+            if target not in mapping:
+                mapping[target] = right_moves[other][sym]
+                work.append(target)
+            elif mapping[target] != right_moves[other][sym]:
+                return False
+    return len(mapping) == len(set(mapping.values())) == len(left_moves) == len(right_moves)
+
+class _CappedParser(SyntaxParser):
+    """闭包缓存只保留少量项，记录缓存的最大项数和未命中（重新求闭包）的次数"""
+    CLOSURE_CACHE_SIZE = 8
+    largest = 0
+    misses = 0
+
+    def _cached_closure(self, key, compute):
+        def counted():
+            self.misses += 1
+            return compute()
+        result = super()._cached_closure(key, counted)
+        self.largest = max(self.largest, len(self._closure_cache))
+        return result
+
+def test_parse_stream_matches_parse(build_parser, programs):
+    parser = build_parser()
+    for source in programs:
+        checker = SemanticChecker()
+        parser.parse(Tokenize().analyse(source), checker=checker)
+        expected = _output(checker)
+        for stream in (source, io.StringIO(source), (source[i:i + 7] for i in range(0, len(source), 7))):
+            checker = SemanticChecker()
+            root = parser.parse_stream(stream, checker=checker)
+            assert _output(checker) == expected
+            assert all(child.children == [] for child in root.children) # 只保留根节点的直接子节点
+    for tokenize in (Tokenize('char'), Tokenize('dfa'), Tokenize('regex', recover=True)): # 需要完整输入，不是有界内存
+        with pytest.raises(ValueError, match='streaming regex engine'):
+            parser.parse_stream(programs[0], tokenize=tokenize)
+
+def test_parse_pulls_one_token_at_a_time(build_parser):
+    def tokens():
+        for token in Tokenize().analyse("fn main( { } fn f() { }"):
+            yield token
+            if token.type is LexicalType.LBRACE:
+                raise AssertionError("parser read past the unexpected token")
+    with pytest.raises(SyntaxError, match='意外Token: \\[LBRACE:{\\]'):
+        build_parser().parse(tokens())
+
+@pytest.mark.parametrize('mode', ['lalr', 'pager'])
+def test_merged_tables_parse_like_lr1(build_parser, programs, syntax_error_programs, mode):
+    reference, parser = build_parser(), build_parser(mode)
+    assert len(parser.states) < len(reference.states)
+    for source in programs:
+        assert _run(parser, source) == _run(reference, source)
+    for source in syntax_error_programs: # 合并后报错位置不变，期望的Token集合可能更大
+        assert _error_position(_run(parser, source)) == _error_position(_run(reference, source))
+
+@pytest.mark.parametrize('mode', ['lalr', 'pager'])
+def test_new_conflicts(mode):
+    for grammar, expected in ((_MERGE_GRAMMAR, 0 if mode == 'pager' else 2), (_INHERENT_GRAMMAR, 0)):
+        reference = SyntaxParser()
+        reference.build_table(grammar)
+        assert reference.new_conflicts is None
+        parser = SyntaxParser()
+        parser.build_table(grammar, mode)
+        compared = SyntaxParser()
+        compared.build_table(grammar, mode, baseline=reference.conflicts)
+        assert [c.key() for c in parser.new_conflicts] == [c.key() for c in compared.new_conflicts]
+        assert len(parser.new_conflicts) == expected
+        assert all(c.symbol in ('d', 'e') for c in parser.new_conflicts)
+
+def test_cached_table_keeps_new_conflicts(tmp_path):
+    built = SyntaxParser()
+    built.load_table(_MERGE_GRAMMAR, cache_dir=str(tmp_path), mode='lalr')
+    cached = SyntaxParser()
+    cached.load_table(_MERGE_GRAMMAR, cache_dir=str(tmp_path), mode='lalr')
+    assert cached.states == [] # 读取了缓存
+    assert [c.key() for c in cached.new_conflicts] == [c.key() for c in built.new_conflicts] and len(built.new_conflicts) == 2
+    assert cached.action == built.action and cached.goto_tbl == built.goto_tbl
+
+def test_grammar_hash_is_stable_across_processes():
+    """文法中的终结符为集合，缓存键不能随进程的字符串哈希种子变化"""
+    code = "from compiler_parser import grammar_hash; from compiler_rust_grammar import RUST_GRAMMAR_PPT; print(grammar_hash(RUST_GRAMMAR_PPT))"
+    hashes = {subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             env=dict(os.environ, PYTHONHASHSEED=str(seed)), capture_output=True, text=True, check=True).stdout
+              for seed in range(3)}
+    assert hashes == {grammar_hash(RUST_GRAMMAR_PPT) + '\n'}
+
+def test_cached_table_skips_grammar_analysis_and_replaces_stale_caches(tmp_path, monkeypatch):
+    built = SyntaxParser()
+    built.load_table(_MERGE_GRAMMAR, cache_dir=str(tmp_path), name='merge')
+    first_cache = {path.name for path in tmp_path.iterdir()}
+    other = SyntaxParser() # 其他名称和参数的缓存不受影响
+    other.load_table(_INHERENT_GRAMMAR, cache_dir=str(tmp_path), name='inherent')
+    other.load_table(_MERGE_GRAMMAR, cache_dir=str(tmp_path), mode='lalr', name='merge')
+    kept = {path.name for path in tmp_path.iterdir()} - first_cache
+    changed = dict(_MERGE_GRAMMAR, productions=_MERGE_GRAMMAR['productions'] + [{'prod_lhs': 'A', 'prod_rhs': ['d']}])
+    SyntaxParser().load_table(changed, cache_dir=str(tmp_path), name='merge')
+    remaining = {path.name for path in tmp_path.iterdir()}
+    assert len(remaining) == 3 and kept < remaining and not first_cache & remaining # 文法修改后旧缓存被替换
+    monkeypatch.setattr(SyntaxParser, '_compute_first', lambda self: pytest.fail("cache hit recomputed FIRST"))
+    monkeypatch.setattr(SyntaxParser, '_print_grammar', lambda self: pytest.fail("cache hit logged the grammar"))
+    cached = SyntaxParser()
+    cached.load_table(_MERGE_GRAMMAR, cache_dir=str(tmp_path), mode='lalr', name='merge')
+    assert cached.states == [] and cached.action == other.action and cached.goto_tbl == other.goto_tbl
+    assert cached.rules == other.rules and cached.terminals == other.terminals
+
+@pytest.mark.parametrize('mode', ['lalr', 'pager'])
+def test_capped_closure_cache_builds_same_table(build_parser, mode):
+    reference = build_parser(mode)
+    parser = _CappedParser()
+    parser.build_table(RUST_GRAMMAR_PPT, mode)
+    assert parser.largest == parser.CLOSURE_CACHE_SIZE # 缓存达到上限后淘汰旧项，不再增长
+    assert parser.misses > len(reference._closure_cache) # 被淘汰的闭包重新计算
+    assert parser.action == reference.action and parser.goto_tbl == reference.goto_tbl
+    assert parser.conflicts == reference.conflicts
+
+def test_lr1_closes_each_kernel_once(monkeypatch):
+    """规范LR(1)按核心去重，每个状态的闭包只求一次，不经过闭包缓存"""
+    closed = []
+    closure_bits = SyntaxParser._closure_bits
+    monkeypatch.setattr(SyntaxParser, '_closure_bits', lambda self, kernel: closed.append(frozenset(kernel.items())) or closure_bits(self, kernel))
+    parser = SyntaxParser()
+    parser.build_table(RUST_GRAMMAR_PPT)
+    assert len(closed) == len(set(closed)) == len(parser.states)
+    assert parser._closure_cache == {}
+
+@pytest.mark.parametrize('grammar', [RUST_GRAMMAR_PPT, _MERGE_GRAMMAR, _INHERENT_GRAMMAR], ids=['rust', 'merge', 'inherent'])
+def test_tables_match_textbook_construction(grammar):
+    states, transitions, actions = _reference_lr1(grammar)
+    for mode, expected in (('lr1', (transitions, actions)), ('lalr', _merge_cores(states, transitions, actions))):
+        parser = SyntaxParser()
+        parser.build_table(grammar, mode)
+        assert _isomorphic(_automaton(parser), expected)
+
+@pytest.mark.parametrize('mode', ['lr1', 'lalr'])
+def test_trace_matches_reference_snapshots(build_parser, programs, monkeypatch, mode):
+    monkeypatch.setattr(ParseTrace, 'CHECKPOINT_INTERVAL', 5) # 随机访问跨越多个检查点
+    parser = build_parser(mode)
+    for source in programs[:10]:
+        tokens = Tokenize().analyse(source)
+        _, expected = _reference_parse(parser, tokens, trace=True)
+        _, trace = parser.parse(tokens, trace=True)
+        assert len(trace) == len(expected)
+        assert list(trace) == expected
+        for index in (*range(0, len(expected), 7), -1, -len(expected)):
+            assert trace[index] == expected[index]
+        with pytest.raises(IndexError):
+            trace[len(expected)]
+        assert parser.parse(tokens)[1] == []
+
+@pytest.mark.parametrize('mode', ['lr1', 'lalr', 'pager'])
+def test_table_driver_matches_reference_loop(build_parser, programs, syntax_error_programs, mode):
+    parser = build_parser(mode)
+    for source in programs:
+        checker = _RecordingChecker()
+        root, _ = _reference_parse(parser, Tokenize().analyse(source), checker)
+        assert _run(parser, source) == (_tree(root), *_output(checker), checker.reduced)
+    for source in syntax_error_programs:
+        with pytest.raises(SyntaxError) as expected:
+            _reference_parse(parser, Tokenize().analyse(source))
+        assert _run(parser, source).split('\n')[:3] == str(expected.value).split('\n')
+
+def test_parse_restores_garbage_collection(build_parser, syntax_error_programs, monkeypatch):
+    """默认不改变循环垃圾回收的设置；disable_gc=True时分析期间暂停，结束或出错后恢复原来的设置"""
+    parser = build_parser()
+    states = []
+    monkeypatch.setattr(parser.table, 'terminal_ids', _RecordingDict(parser.table.terminal_ids, lambda: states.append(gc.isenabled())))
+    parser.parse(Tokenize().analyse("fn main() { let a = 1; }"))
+    assert states and all(states)
+    states.clear()
+    parser.parse(Tokenize().analyse("fn main() { let a = 1; }"), disable_gc=True)
+    assert states and not any(states)
+    assert gc.isenabled()
+    with pytest.raises(SyntaxError):
+        parser.parse(Tokenize().analyse(syntax_error_programs[0]), disable_gc=True)
+    assert gc.isenabled()
+    gc.disable()
+    try:
+        parser.parse(Tokenize().analyse("fn main() { let a = 1; }"), disable_gc=True)
+        assert not gc.isenabled()
+    finally:
+        gc.enable()
+
+@pytest.mark.parametrize('mode', ['lr1', 'lalr'])
+def test_bypass_keeps_semantics(build_parser, programs, syntax_error_programs, mode):
+    plain, parser = build_parser(mode), build_parser(mode, bypass=True)
+    assert len(parser.action) > len(plain.action) # 以状态数换取更少的规约
+    reduced = bypassed = 0
+    for source in programs:
+        tree, quads, errors, calls = _run(plain, source)
+        bypass_tree, *output, bypass_calls = _run(parser, source)
+        assert bypass_tree == _collapse_units(tree, RUST_GRAMMAR_PPT)
+        assert output == [quads, errors]
+        assert _run(parser, source, prune=True)[1:3] == (quads, errors)
+        reduced, bypassed = reduced + len(calls), bypassed + len(bypass_calls)
+    assert bypassed < reduced * 0.75
+    for source in syntax_error_programs:
+        assert _error_position(_run(parser, source)) == _error_position(_run(plain, source))
@@ -0,0 +1,65 @@
+"""语法分析器生成器测试"""
+import importlib.util
+import subprocess
+import sys
+import pytest
+from compiler_lexer import Tokenize
+from compiler_parser_generator import write_parser_module
+from compiler_semantic_checker import SemanticChecker
+
+def _tree(node):
+    """语法树的嵌套元组形式"""
+    if node.token is not None:
+        return node.symbol, node.token.value
+    return node.symbol, tuple(_tree(child) for child in node.children)
+
+def _load(path):
+    """从文件导入生成的模块"""
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _run(parse, tokens, checker=None):
+    """分析结果：(语法树, 四元式, 语义错误)，语法错误时为错误信息（上下文中的Token为同一批对象）"""
+    try:
+        root = parse(tokens, checker=checker)
+    except SyntaxError as error:
+        return str(error)
+    if checker is None:
+        return _tree(root)
+    return _tree(root), [str(quad) for quad in checker.get_quads()], [str(error) for error in checker.get_errors()]
+
+@pytest.mark.parametrize('mode, bypass', [('lr1', False), ('lalr', True)])
+def test_generated_module_matches_parse(build_parser, tmp_path, programs, syntax_error_programs, mode, bypass):
+    parser = build_parser(mode, bypass)
+    path = tmp_path / f"generated_{mode}_{int(bypass)}.py"
+    write_parser_module(parser, path)
+    generated = _load(path)
+    parse = lambda tokens, checker=None: parser.parse(tokens, checker=checker)[0]
+    for source in programs:
+        tokens = Tokenize().analyse(source)
+        assert _run(generated.parse, tokens, SemanticChecker()) == _run(parse, tokens, SemanticChecker())
+        assert _run(generated.parse, tokens) == _run(parse, tokens)
+    for source in syntax_error_programs:
+        tokens = Tokenize().analyse(source)
+        expected = _run(parse, tokens)
+        assert isinstance(expected, str)
+        assert _run(generated.parse, tokens) == expected
+
+def test_generated_module_is_self_contained(build_parser, tmp_path):
+    """不做语义检查时生成的模块不导入项目中的模块"""
+    parser = build_parser('lr1')
+    path = tmp_path / 'generated_parser.py'
+    write_parser_module(parser, path)
+    tokens = [(token.type.value, token.value, token.line, token.column) for token in Tokenize().analyse("fn main() { let a = 1; }")]
+    script = (
+        "import sys\n"
+        "from types import SimpleNamespace as T\n"
+        "import generated_parser\n"
+        f"tokens = [T(type=T(value=t), value=v, line=l, column=c) for t, v, l, c in {tokens!r}]\n"
+        "root = generated_parser.parse(tokens)\n"
+        "print(root.symbol, sorted(name for name in sys.modules if name.startswith('compiler_')))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == [parser.parse(Tokenize().analyse("fn main() { let a = 1; }"))[0].symbol, '[]']
@@ -0,0 +1,63 @@
+"""词法分析结果缓存测试：命中时还原的词法元素与重新分析一致"""
+import os
+import pytest
+from compiler_lexer import LexicalError, Tokenize
+from compiler_token_cache import TokenCache
+
+_SOURCES = [
+    '',
+    'fn main() { let a = 1; let b = 1.0; let c = 4294967296 + a; }',
+    '// 注释\nfn 主函数() {\n    let s = "字符串\\t\\"é\\"";\n    /* 多行\n注释 */ s = s;\n}\n',
+    'let x = y >>= 2 .. z -> w :: v;\n\n\n   ',
+]
+
+def _key(elements):
+    return [(e.type, e.value, type(e.value), e.offset, e.line, e.column, getattr(e, 'string_id', None)) for e in elements]
+
+def test_round_trip(tmp_path, monkeypatch):
+    cache = TokenCache(str(tmp_path))
+    for source in _SOURCES:
+        expected = _key(Tokenize().analyse(source))
+        assert _key(Tokenize(cache=cache).analyse(source)) == expected # 未命中，分析后写入缓存
+    assert len(os.listdir(tmp_path)) == len(_SOURCES)
+    def no_lexing(*args):
+        raise AssertionError("cache hit must not lex")
+    monkeypatch.setattr(Tokenize, '_scan_chars', no_lexing)
+    for source in _SOURCES:
+        lexer = Tokenize(cache=cache)
+        tokens = lexer.analyse(source)
+        fresh = Tokenize('regex')
+        assert _key(tokens) == _key(fresh.analyse(source))
+        assert lexer.strings.strings == fresh.strings.strings # 字符串池按出现顺序重建
+
+def test_errors_are_not_cached(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    for _ in range(2):
+        with pytest.raises(LexicalError):
+            Tokenize(cache=cache).analyse('let a = $;')
+    lexer = Tokenize(recover=True, cache=cache)
+    lexer.analyse('let a = $;')
+    assert lexer.diagnostics and os.listdir(tmp_path) == []
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    source = _SOURCES[1]
+    Tokenize(cache=cache).analyse(source)
+    path, = (os.path.join(tmp_path, name) for name in os.listdir(tmp_path))
+    with open(path, 'wb') as file:
+        file.write(b'not a token cache')
+    assert _key(Tokenize(cache=cache).analyse(source)) == _key(Tokenize().analyse(source))
+    with open(path, 'rb') as file: # 重新分析后写入了完整的缓存
+        assert file.read() != b'not a token cache'
+
+def test_lru_eviction(tmp_path):
+    cache = TokenCache(str(tmp_path))
+    sources = [f"let a{i} = {i};" * 20 for i in range(3)]
+    for i, source in enumerate(sources):
+        Tokenize(cache=cache).analyse(source)
+        os.utime(cache._path(source), (1000 + i, 1000 + i))
+    os.utime(cache._path(sources[0]), (2000, 2000)) # 最近使用过第一个
+    sizes = {source: os.path.getsize(cache._path(source)) for source in sources}
+    cache.max_bytes = sum(sizes.values()) - 1
+    cache._evict()
+    assert [os.path.exists(cache._path(source)) for source in sources] == [True, False, True]